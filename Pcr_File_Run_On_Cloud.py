@@ -1,13 +1,10 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 import time
 from datetime import datetime, timedelta
 import re
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import threading
 
+# requests, bs4, pandas, gspread and oauth2client are imported on first use
+
 # === PCR URL and Headers ===
 pcr_url = "https://niftyinvest.com/put-call-ratio/CRUDEOILM"
 headers = {
@@ -17,15 +14,27 @@ headers = {
 # === Store last values for PCR calculations ===
 last_values = {"put_oi": None, "call_oi": None, "pcr": None}
 
-# === Google Sheets Setup ===
+# === Google Sheets Setup (authenticated on first write, not at import) ===
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name("C:\\Users\\Pankaj\\Desktop\\python\\credentials.json", scope)
-client = gspread.authorize(creds)
-sheet_pcr = client.open("CrudeOil_PCR_Live_Data").worksheet("PCR_Data_Live")
+sheet_pcr = None
+
+def get_sheet_pcr():
+    global sheet_pcr
+    if sheet_pcr is None:
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        creds = ServiceAccountCredentials.from_json_keyfile_name("C:\\Users\\Pankaj\\Desktop\\python\\credentials.json", scope)
+        client = gspread.authorize(creds)
+        sheet_pcr = client.open("CrudeOil_PCR_Live_Data").worksheet("PCR_Data_Live")
+    return sheet_pcr
 
 # === Function to fetch PCR data ===
 def fetch_pcr_data():
     try:
+        import requests
+        import pandas as pd
+        from bs4 import BeautifulSoup
+
         response = requests.get(pcr_url, headers=headers, timeout=10)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, "html.parser")
@@ -96,6 +105,7 @@ def update_google_sheets():
     pcr_df = fetch_pcr_data()
     if pcr_df is not None:
         try:
+            sheet_pcr = get_sheet_pcr()
             gsheet_pcr_last_row = len(sheet_pcr.col_values(1)) + 1
             if gsheet_pcr_last_row == 1:
                 sheet_pcr.update(values=[["Timestamp", "Intraday Put Change OI", "Put Change", "Intraday Call Change OI", 
@@ -0,0 +1,292 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Default rule thresholds (COI PCR bands match the Trend column)
+COI_HIGH = float(os.environ.get('PCR_ALERT_COI_HIGH', 1.2))
+COI_LOW = float(os.environ.get('PCR_ALERT_COI_LOW', 0.8))
+HYSTERESIS = float(os.environ.get('PCR_ALERT_HYSTERESIS', 0.05))
+COOLDOWN_SECONDS = float(os.environ.get('PCR_ALERT_COOLDOWN', 300))
+OI_SPIKE = int(os.environ.get('PCR_ALERT_OI_SPIKE', 10000))
+
+WEBHOOK_TIMEOUT = 5
+
+
+class Rule:
+    """Alert rule; evaluate() sees one snapshot and keeps O(1) state between calls"""
+
+    def __init__(self, name, cooldown=COOLDOWN_SECONDS):
+        self.name = name
+        self.cooldown = cooldown
+        self.last_fired = None
+
+    def evaluate(self, values):
+        """Message if the rule matches this snapshot, else None"""
+        raise NotImplementedError
+
+    def reset(self):
+        self.last_fired = None
+
+    def check(self, values, now):
+        message = self.evaluate(values)
+        if message is None:
+            return None
+        if self.last_fired is not None and now - self.last_fired < self.cooldown:
+            return None
+        self.last_fired = now
+        return message
+
+
+class ThresholdRule(Rule):
+    """Fires when a value crosses a level; re-arms only once it is back past the hysteresis band"""
+
+    def __init__(self, name, field, level, direction='above', hysteresis=HYSTERESIS, **kwargs):
+        super().__init__(name, **kwargs)
+        self.field = field
+        self.level = level
+        self.direction = direction
+        self.hysteresis = hysteresis
+        # None until the first value is seen; that value is the baseline, not a crossing
+        self.armed = None
+
+    def evaluate(self, values):
+        value = values.get(self.field)
+        if value is None:
+            return None
+
+        if self.direction == 'above':
+            crossed = value >= self.level
+            rearm = value < self.level - self.hysteresis
+        else:
+            crossed = value <= self.level
+            rearm = value > self.level + self.hysteresis
+
+        if self.armed is None:
+            self.armed = not crossed
+            return None
+        if rearm:
+            self.armed = True
+        if crossed and self.armed:
+            self.armed = False
+            return f"{self.field} {value:g} crossed {self.direction} {self.level:g}"
+        return None
+
+    def reset(self):
+        super().reset()
+        self.armed = None
+
+
+class ChangeRule(Rule):
+    """Fires when a field changes from its previous value (e.g. Trend flips)"""
+
+    def __init__(self, name, field, **kwargs):
+        super().__init__(name, **kwargs)
+        self.field = field
+        self.previous = None
+
+    def evaluate(self, values):
+        value = values.get(self.field)
+        previous = self.previous
+        self.previous = value
+        if previous is None or value is None or value == previous:
+            return None
+        return f"{self.field} changed: {previous} → {value}"
+
+    def reset(self):
+        super().reset()
+        self.previous = None
+
+
+class TrendRule(Rule):
+    """Fires when a value moves into another trend band (Bearish <= low < Neutral < high <= Bullish)
+
+    Leaving the Bullish or Bearish band takes the hysteresis margin, so a value
+    hovering around a band edge flips the trend once instead of every minute.
+    """
+
+    BULLISH = "Bullish Trend"
+    NEUTRAL = "Neutral Trend"
+    BEARISH = "Bearish Trend"
+
+    def __init__(self, name, field, low, high, hysteresis=HYSTERESIS, **kwargs):
+        super().__init__(name, **kwargs)
+        self.field = field
+        self.low = low
+        self.high = high
+        self.hysteresis = hysteresis
+        # None until the first value is seen; that value sets the band without firing
+        self.band = None
+
+    def classify(self, value):
+        if value >= self.high:
+            return self.BULLISH
+        if value <= self.low:
+            return self.BEARISH
+        return self.NEUTRAL
+
+    def evaluate(self, values):
+        value = values.get(self.field)
+        if value is None:
+            return None
+
+        band = self.classify(value)
+        previous = self.band
+        if previous is None:
+            self.band = band
+            return None
+        if band == previous:
+            return None
+        if previous == self.BULLISH and value > self.high - self.hysteresis:
+            return None
+        if previous == self.BEARISH and value < self.low + self.hysteresis:
+            return None
+
+        self.band = band
+        return f"Trend changed: {previous} → {band} ({self.field} {value:g})"
+
+    def reset(self):
+        super().reset()
+        self.band = None
+
+
+class SpikeRule(Rule):
+    """Fires when the absolute value of a field reaches a limit (e.g. per-minute OI difference)"""
+
+    def __init__(self, name, field, limit, **kwargs):
+        super().__init__(name, **kwargs)
+        self.field = field
+        self.limit = limit
+
+    def evaluate(self, values):
+        value = values.get(self.field)
+        if value is None or abs(value) < self.limit:
+            return None
+        return f"{self.field} {value:+,} (limit ±{self.limit:,})"
+
+
+def default_rules():
+    return [
+        TrendRule('trend_flip', 'coi_pcr', COI_LOW, COI_HIGH, cooldown=0),
+        ThresholdRule('coi_pcr_bullish', 'coi_pcr', COI_HIGH, 'above'),
+        ThresholdRule('coi_pcr_bearish', 'coi_pcr', COI_LOW, 'below'),
+        SpikeRule('put_oi_spike', 'put_change', OI_SPIKE),
+        SpikeRule('call_oi_spike', 'call_change', OI_SPIKE),
+    ]
+
+
+class StdoutChannel:
+    name = "stdout"
+
+    def send(self, alert):
+        print(f"🚨 ALERT [{alert['symbol']}] {alert['rule']}: {alert['message']}")
+
+
+class WebhookChannel:
+    name = "webhook"
+
+    def __init__(self, url):
+        self.url = url
+
+    def send(self, alert):
+        import requests
+
+        response = requests.post(self.url, json=alert, timeout=WEBHOOK_TIMEOUT)
+        response.raise_for_status()
+
+
+def build_channels(spec):
+    """Channels from a spec like "stdout,webhook:http://localhost:9000/alerts" """
+    channels = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kind, _, target = entry.partition(':')
+        kind = kind.lower()
+        if kind == 'stdout':
+            channels.append(StdoutChannel())
+        elif kind == 'webhook':
+            if not target:
+                raise ValueError("webhook alert channel needs a URL")
+            channels.append(WebhookChannel(target))
+        else:
+            raise ValueError(f"Unknown alert channel '{kind}'")
+    return channels
+
+
+class AlertEngine:
+    """Evaluates every rule against each snapshot and hands matches to the channels
+
+    Network channels are sent from a background thread so evaluation adds only
+    microseconds to the tick.
+    """
+
+    def __init__(self, rules=None, channels=None):
+        self.rules = default_rules() if rules is None else rules
+        if channels is None:
+            channels = build_channels(os.environ.get('PCR_ALERT_CHANNELS', 'stdout'))
+        self.channels = channels
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alerts")
+        self.fired = 0
+
+    def reset(self):
+        for rule in self.rules:
+            rule.reset()
+
+    def prime(self, values):
+        """Feed a snapshot that was already alerted on (e.g. the last sheet row) without sending"""
+        for rule in self.rules:
+            rule.evaluate(values)
+
+    def evaluate(self, symbol, values, timestamp):
+        """Run all rules on one snapshot; returns the alerts that fired"""
+        now = time.monotonic()
+        alerts = []
+        for rule in self.rules:
+            message = rule.check(values, now)
+            if message is not None:
+                alerts.append({
+                    'symbol': symbol,
+                    'rule': rule.name,
+                    'message': message,
+                    'timestamp': timestamp,
+                    'values': values,
+                })
+
+        for alert in alerts:
+            self.fired += 1
+            for channel in self.channels:
+                if isinstance(channel, StdoutChannel):
+                    channel.send(alert)
+                else:
+                    self.executor.submit(self._send, channel, alert, now)
+        return alerts
+
+    def _send(self, channel, alert, detected_at):
+        try:
+            channel.send(alert)
+            print(f"🚨 Alert '{alert['rule']}' sent via {channel.name} "
+                  f"{(time.monotonic() - detected_at) * 1000:.0f}ms after detection")
+        except Exception as e:
+            print(f"❌ Alert channel '{channel.name}' error: {e}")
+
+
+def snapshot_values(data, trend, previous_put_oi, previous_call_oi):
+    """Numeric view of a snapshot for the rules"""
+    def to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    coi_pcr = to_float(data['coi_pcr'])
+    return {
+        'trend': trend,
+        'coi_pcr': coi_pcr if data['coi_pcr'] not in ("0", "0.00") else None,
+        'intraday_pcr': to_float(data['intraday_pcr']),
+        'put_oi': data['put_oi'],
+        'call_oi': data['call_oi'],
+        'put_change': data['put_oi'] - previous_put_oi if previous_put_oi is not None else None,
+        'call_change': data['call_oi'] - previous_call_oi if previous_call_oi is not None else None,
+        'price': to_float(data['crudeoil_price']),
+    }
@@ -0,0 +1,863 @@
+import re
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+import alerts
+import resilience
+import rollups
+import scheduler_lock
+import session_summary
+import sheets_quota
+import tick_profiler
+
+# requests, bs4, gspread and pytz are imported inside the functions that use them
+# so the headless worker only pays for them when a tick actually runs
+
+DEFAULT_SYMBOL = "CRUDEOILM"
+# Price, Day High and Day Low parsing assume crude oil prices (4 digits, roughly 5000-7000),
+# so only the crude oil contracts are supported
+SUPPORTED_SYMBOLS = ("CRUDEOILM", "CRUDEOIL")
+PCR_URL = "https://niftyinvest.com/put-call-ratio/{symbol}"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+SPREADSHEET_NAME = "CrudeOil_PCR_Live_Data"
+WORKSHEET_NAME = "PCR_Data_Live"
+FIRST_DATA_ROW = 18
+# Observation (column J) of rows carried forward while the source is down
+STALE_MARKER = "⚠️ STALE"
+# Rollup worksheets keep their history across days; grow the grid this many rows at a time
+ROLLUP_GROW_ROWS = 500
+
+# Per-request timeout of the shared Sheets client. It is set once and never changed;
+# callers with a tighter deadline wait on the call instead (see resilience.call_with_deadline)
+SHEETS_DEFAULT_TIMEOUT = 30
+# Upper bound for a single page fetch attempt
+FETCH_TIMEOUT = 10
+
+# Cached Google Sheets client and worksheets (authenticate once per process)
+_client = None
+_worksheets = {}
+
+# Per-symbol circuit breakers and last good snapshot (carried forward while the source is down)
+_breakers = {}
+_last_good = {}
+
+# Per-symbol session statistics for the summary block in rows 1-17
+_summaries = {}
+
+# Per-symbol (Put OI, Call OI) of the last row, for the difference columns
+_previous = {}
+
+# Per-symbol alert rules, evaluated before the row goes to the sinks, and the
+# channels they share (built once from PCR_ALERT_CHANNELS)
+_alert_engines = {}
+_alert_channels = None
+
+# Per-symbol 5m/15m/1h rollups, and the next free row of each rollup worksheet
+_rollups = {}
+_rollup_next_row = {}
+# Per-symbol {label: [rows]} of closed buckets not yet written; only a successful write clears them
+_rollup_pending = {}
+_rollup_lock = threading.Lock()
+
+# Fans each row out to Sheets / files / webhook (see sinks.py)
+_dispatcher = None
+
+# Token of the last session reset this process applied; any worker may publish a reset
+_session_epoch = None
+
+# Symbols whose session state was rebuilt from the sheet (once per session per process)
+_restored = set()
+
+def now_ist():
+    import pytz
+    return datetime.now(pytz.timezone('Asia/Kolkata'))
+
+def is_market_hours(current_time):
+    """Live data window: 9 AM to 11:30 PM IST"""
+    current_hour = current_time.hour
+    current_minute = current_time.minute
+    return 9 <= current_hour < 23 or (current_hour == 23 and current_minute <= 30)
+
+def is_last_market_minute(current_time):
+    return current_time.hour == 23 and current_time.minute == 30
+
+def worksheet_name(symbol):
+    """CRUDEOILM keeps the original worksheet, other symbols get their own"""
+    if symbol == DEFAULT_SYMBOL:
+        return WORKSHEET_NAME
+    return f"{WORKSHEET_NAME}_{symbol}"
+
+def get_worksheet(symbol=DEFAULT_SYMBOL, priority=sheets_quota.LIVE):
+    """Open (and cache) the live data worksheet for a symbol"""
+    global _client
+
+    import gspread
+
+    if symbol not in _worksheets:
+        if _client is None:
+            creds_json = json.loads(os.environ['GOOGLE_CREDENTIALS'])
+            _client = gspread.service_account_from_dict(creds_json)
+            _client.set_timeout(SHEETS_DEFAULT_TIMEOUT)
+        # Opening costs a Drive lookup plus the spreadsheet metadata fetch
+        spreadsheet = sheets_quota.call(priority, 2, _client.open, SPREADSHEET_NAME)
+        title = worksheet_name(symbol)
+        try:
+            _worksheets[symbol] = sheets_quota.call(priority, 1, spreadsheet.worksheet, title)
+        except gspread.exceptions.WorksheetNotFound:
+            print(f"🆕 Creating worksheet '{title}'")
+            _worksheets[symbol] = sheets_quota.call(priority, 1, spreadsheet.add_worksheet,
+                                                    title=title, rows=2000, cols=18)
+    return _worksheets[symbol]
+
+def get_rollup_worksheet(symbol, label, priority=sheets_quota.LIVE):
+    """Worksheet for one rollup timeframe (created with a header row if missing)"""
+    import gspread
+
+    key = (symbol, label)
+    if key not in _worksheets:
+        spreadsheet = get_worksheet(symbol, priority).spreadsheet
+        title = f"{worksheet_name(symbol)}_{label}"
+        try:
+            _worksheets[key] = sheets_quota.call(priority, 1, spreadsheet.worksheet, title)
+        except gspread.exceptions.WorksheetNotFound:
+            print(f"🆕 Creating rollup worksheet '{title}'")
+            worksheet = sheets_quota.call(priority, 1, spreadsheet.add_worksheet,
+                                          title=title, rows=2000, cols=len(rollups.HEADER))
+            sheets_quota.call(priority, 1, worksheet.update, values=[rollups.HEADER], range_name="A1:K1")
+            _worksheets[key] = worksheet
+            _rollup_next_row[key] = 2
+    return _worksheets[key]
+
+def next_rollup_row(symbol, label, priority=sheets_quota.LIVE):
+    """Next free row of a rollup worksheet (read from the sheet once, then tracked here)"""
+    key = (symbol, label)
+    worksheet = get_rollup_worksheet(symbol, label, priority)
+    if key not in _rollup_next_row:
+        _rollup_next_row[key] = len(sheets_quota.call(priority, 1, worksheet.col_values, 1)) + 1
+    return worksheet, _rollup_next_row[key]
+
+def get_rollups(symbol=DEFAULT_SYMBOL):
+    if symbol not in _rollups:
+        _rollups[symbol] = rollups.RollupSet()
+    return _rollups[symbol]
+
+def get_breaker(symbol=DEFAULT_SYMBOL):
+    if symbol not in _breakers:
+        _breakers[symbol] = resilience.CircuitBreaker(symbol)
+    return _breakers[symbol]
+
+def get_summary(symbol=DEFAULT_SYMBOL):
+    if symbol not in _summaries:
+        _summaries[symbol] = session_summary.SessionSummary()
+    return _summaries[symbol]
+
+def configure_alerts(spec=None):
+    """Build the alert channels once; a bad spec falls back to stdout instead of failing ticks"""
+    global _alert_channels
+
+    if spec is None:
+        spec = os.environ.get('PCR_ALERT_CHANNELS', 'stdout')
+    try:
+        _alert_channels = alerts.build_channels(spec)
+    except ValueError as e:
+        print(f"❌ Invalid PCR_ALERT_CHANNELS '{spec}': {e} - sending alerts to stdout only")
+        _alert_channels = [alerts.StdoutChannel()]
+    return _alert_channels
+
+def get_alert_engine(symbol=DEFAULT_SYMBOL):
+    if symbol not in _alert_engines:
+        channels = _alert_channels if _alert_channels is not None else configure_alerts()
+        _alert_engines[symbol] = alerts.AlertEngine(channels=channels)
+    return _alert_engines[symbol]
+
+def reset_session():
+    """Forget the carried-forward snapshots and session statistics (new trading day)"""
+    _last_good.clear()
+    _previous.clear()
+    _restored.clear()
+    for summary in _summaries.values():
+        summary.reset()
+    for engine in _alert_engines.values():
+        engine.reset()
+    for rollup_set in _rollups.values():
+        rollup_set.reset()
+
+def publish_session_reset(reset_date):
+    """Reset this process's session state and have every other worker (the leader) do the same"""
+    global _session_epoch
+    reset_session()
+    _session_epoch = f"{os.getpid()}-{time.time()}"
+    scheduler_lock.update_shared_state(session_epoch=_session_epoch, reset_date=reset_date,
+                                       last_written_row=None)
+
+def record_sheet_write(symbol):
+    """Note in the shared state which worker wrote the symbol's last sheet row"""
+    scheduler_lock.update_shared_state(**{f'sheet_writer_{symbol}': os.getpid()})
+
+def sync_session(symbol):
+    """Apply what other workers did to the sheet before writing the next row
+
+    A published reset clears the whole session state; a row written by another
+    worker (a follower's /update) drops the cached previous values, so the
+    differences are measured against the row above again.
+    """
+    global _session_epoch
+    state = scheduler_lock.read_shared_state()
+    epoch = state.get('session_epoch')
+    if epoch != _session_epoch:
+        if _session_epoch is not None:
+            print("🔄 Session was reset by another worker, clearing session state")
+        reset_session()
+        _session_epoch = epoch
+
+    writer = state.get(f'sheet_writer_{symbol}')
+    if writer is not None and writer != os.getpid() and symbol in _previous:
+        print(f"🔄 Last {symbol} row was written by worker {writer}, re-reading previous values")
+        del _previous[symbol]
+
+def check_symbol(symbol):
+    if symbol not in SUPPORTED_SYMBOLS:
+        raise ValueError(f"Unsupported symbol '{symbol}' (supported: {', '.join(SUPPORTED_SYMBOLS)})")
+
+def fetch_page_text(symbol=DEFAULT_SYMBOL, timeout=FETCH_TIMEOUT):
+    """Download the niftyinvest PCR page and return its visible text"""
+    import requests
+    from bs4 import BeautifulSoup
+
+    response = requests.get(PCR_URL.format(symbol=symbol), headers=HEADERS, timeout=timeout)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, "html.parser")
+    return soup.get_text()
+
+def fetch_with_retry(symbol, stage):
+    """Retry the fetch with backoff for as long as the fetch stage budget allows"""
+    attempt = 0
+    last_error = None
+
+    while stage.remaining() > 1:
+        attempt += 1
+        try:
+            return fetch_page_text(symbol, timeout=min(FETCH_TIMEOUT, stage.remaining()))
+        except Exception as e:
+            last_error = e
+            backoff = min(2 ** (attempt - 1), stage.remaining())
+            print(f"⚠️ Fetch attempt {attempt} for {symbol} failed: {e} (retrying in {backoff:.1f}s)")
+            time.sleep(backoff)
+
+    raise resilience.SourceUnavailable(f"fetch failed after {attempt} attempts: {last_error}")
+
+def extract_day_high_low(all_text):
+    """Extract Day High and Day Low from website text"""
+    try:
+        day_high = "0"
+        day_low = "0"
+
+        print("🔍 Searching for Day High/Low data...")
+
+        lines = all_text.split('\n')
+        for i, line in enumerate(lines):
+            if any(keyword in line.lower() for keyword in ['high', 'low', 'l:', 'h:', 'l :', 'h :']):
+                if len(line.strip()) > 3:
+                    print(f"Line {i}: {line.strip()}")
+
+        high_low_patterns = [
+            r'L:\s*(\d{4,5})\s*H:\s*(\d{4,5})',
+            r'Low\s*:\s*(\d{4,5}).*?High\s*:\s*(\d{4,5})',
+            r'L\s*:\s*(\d{4,5}).*?H\s*:\s*(\d{4,5})',
+            r'Day Low\s*:\s*(\d{4,5}).*?Day High\s*:\s*(\d{4,5})',
+        ]
+
+        for pattern in high_low_patterns:
+            hl_match = re.search(pattern, all_text, re.IGNORECASE)
+            if hl_match:
+                day_low = hl_match.group(1)
+                day_high = hl_match.group(2)
+                print(f"✅ Day High/Low found with pattern '{pattern}': {day_high}/{day_low}")
+                break
+
+        if day_high == "0" or day_low == "0":
+            high_patterns = [
+                r'H:\s*(\d{4,5})',
+                r'High\s*:\s*(\d{4,5})',
+                r'H\s*:\s*(\d{4,5})',
+                r'Day High\s*:\s*(\d{4,5})',
+            ]
+
+            low_patterns = [
+                r'L:\s*(\d{4,5})',
+                r'Low\s*:\s*(\d{4,5})',
+                r'L\s*:\s*(\d{4,5})',
+                r'Day Low\s*:\s*(\d{4,5})',
+            ]
+
+            if day_high == "0":
+                for pattern in high_patterns:
+                    high_match = re.search(pattern, all_text, re.IGNORECASE)
+                    if high_match:
+                        day_high = high_match.group(1)
+                        print(f"✅ Day High found with pattern '{pattern}': {day_high}")
+                        break
+
+            if day_low == "0":
+                for pattern in low_patterns:
+                    low_match = re.search(pattern, all_text, re.IGNORECASE)
+                    if low_match:
+                        day_low = low_match.group(1)
+                        print(f"✅ Day Low found with pattern '{pattern}': {day_low}")
+                        break
+
+        if day_high == "0" or day_low == "0":
+            price_context = re.search(r'(\d{4})\s*L:\s*(\d{4,5})\s*H:\s*(\d{4,5})', all_text)
+            if price_context:
+                if day_low == "0":
+                    day_low = price_context.group(2)
+                if day_high == "0":
+                    day_high = price_context.group(3)
+                print(f"✅ Day High/Low (price context): {day_high}/{day_low}")
+
+        if day_high == "0" or day_low == "0":
+            all_numbers = re.findall(r'\b(\d{4,5})\b', all_text)
+            valid_numbers = [n for n in all_numbers if 5000 <= int(n) <= 7000]
+
+            if len(valid_numbers) >= 2:
+                numbers_int = [int(n) for n in valid_numbers]
+                if day_low == "0":
+                    day_low = str(min(numbers_int))
+                if day_high == "0":
+                    day_high = str(max(numbers_int))
+                print(f"✅ Day High/Low (from number range): {day_high}/{day_low}")
+
+        if day_high != "0":
+            high_val = int(day_high)
+            if not (5000 <= high_val <= 7000):
+                print(f"⚠️ Day High {day_high} outside expected range, resetting to 0")
+                day_high = "0"
+
+        if day_low != "0":
+            low_val = int(day_low)
+            if not (5000 <= low_val <= 7000):
+                print(f"⚠️ Day Low {day_low} outside expected range, resetting to 0")
+                day_low = "0"
+
+        print(f"🎯 FINAL Day High/Low: {day_high}/{day_low}")
+        return day_high, day_low
+
+    except Exception as e:
+        print(f"❌ Error extracting Day High/Low: {e}")
+        return "0", "0"
+
+def parse_pcr_data(all_text, symbol=DEFAULT_SYMBOL):
+    """Pull the intraday, total OI, COI PCR and price values out of the page text"""
+    # Intraday data extraction
+    put_match = re.search(r'Put OI Chg\s*([+-]?\d{1,3}(?:,\d{3})*)', all_text)
+    call_match = re.search(r'Call OI Chg\s*([+-]?\d{1,3}(?:,\d{3})*)', all_text)
+    pcr_match = re.search(r'Intraday PCR\s*([+-]?\d+\.\d+)', all_text)
+
+    put_oi_str = put_match.group(1).replace(',', '') if put_match else "0"
+    call_oi_str = call_match.group(1).replace(',', '') if call_match else "0"
+
+    put_oi = int(put_oi_str)
+    call_oi = int(call_oi_str)
+    intraday_pcr = pcr_match.group(1) if pcr_match else "0"
+
+    print(f"✅ Raw Intraday Data - Put: {put_oi_str}, Call: {call_oi_str}, PCR: {intraday_pcr}")
+
+    # Total OI data extraction
+    total_put_oi = 0
+    total_call_oi = 0
+    overall_pcr = "0"
+    crudeoil_price = "0"
+    crudeoil_change = "0"
+    crudeoil_percent_change = "0"
+
+    total_put_oi_pattern = r'Put OI\s*(\d{1,3}(?:,\d{3})*)'
+    total_call_oi_pattern = r'Call OI\s*(\d{1,3}(?:,\d{3})*)'
+    overall_pcr_pattern = r'PCR\s*(\d+\.\d+)'
+
+    total_put_match = re.search(total_put_oi_pattern, all_text)
+    total_call_match = re.search(total_call_oi_pattern, all_text)
+    overall_pcr_match = re.search(overall_pcr_pattern, all_text)
+
+    if total_put_match:
+        total_put_oi = int(total_put_match.group(1).replace(',', ''))
+        print(f"✅ Total Put OI: {total_put_oi:,}")
+
+    if total_call_match:
+        total_call_oi = int(total_call_match.group(1).replace(',', ''))
+        print(f"✅ Total Call OI: {total_call_oi:,}")
+
+    if overall_pcr_match:
+        overall_pcr = overall_pcr_match.group(1)
+        print(f"✅ Overall PCR: {overall_pcr}")
+
+    # 🔥 Extract COI PCR (for Column G) - Ye BASE value hai Trend ke liye
+    coi_pcr = "0.00"
+    coi_pcr_match = re.search(r'COI PCR\s*([+-]?\d+\.\d+)', all_text)
+    if coi_pcr_match:
+        coi_pcr = coi_pcr_match.group(1)
+        print(f"✅ COI PCR: {coi_pcr}")
+    else:
+        # Try alternative pattern
+        coi_pcr_alt = re.search(r'COI\s*PCR\s*([+-]?\d+\.\d+)', all_text, re.IGNORECASE)
+        if coi_pcr_alt:
+            coi_pcr = coi_pcr_alt.group(1)
+            print(f"✅ COI PCR (alt): {coi_pcr}")
+
+    # Price extraction
+    four_digit_numbers = re.findall(r'\b(\d{4})\b', all_text)
+    if four_digit_numbers:
+        valid_prices = [p for p in four_digit_numbers if 5000 <= int(p) <= 6000]
+        if valid_prices:
+            crudeoil_price = valid_prices[0]
+
+    precise_match = re.search(re.escape(symbol) + r'[^\d]*(\d{4})', all_text)
+    if precise_match:
+        crudeoil_price = precise_match.group(1)
+
+    if len(four_digit_numbers) > 1:
+        current_year = str(datetime.now().year)
+        dynamic_numbers = [p for p in four_digit_numbers if p not in [current_year, '2024', '2025']]
+        if dynamic_numbers:
+            crudeoil_price = dynamic_numbers[0]
+
+    if crudeoil_price != "0":
+        change_pattern = re.search(r'(\d{4})\s*\(([+-]?\d+\.\d+)\s*\(([+-]?\d+\.\d+)%\)', all_text)
+        if change_pattern:
+            crudeoil_change = change_pattern.group(2)
+            crudeoil_percent_change = change_pattern.group(3)
+        else:
+            alt_change = re.search(r'([+-]?\d+\.\d+)\s*\(([+-]?\d+\.\d+)%\)', all_text)
+            if alt_change:
+                crudeoil_change = alt_change.group(1)
+                crudeoil_percent_change = alt_change.group(2)
+
+    day_high, day_low = extract_day_high_low(all_text)
+
+    print(f"✅ Intraday Data - Put: {put_oi:,}, Call: {call_oi:,}, PCR: {intraday_pcr}")
+    print(f"📈 Total OI Data - Put: {total_put_oi:,}, Call: {total_call_oi:,}, PCR: {overall_pcr}")
+    print(f"📊 COI PCR: {coi_pcr}")
+
+    return {
+        # Without both OI change values the difference columns would be corrupted
+        'complete': bool(put_match and call_match),
+        'put_oi': put_oi,
+        'call_oi': call_oi,
+        'intraday_pcr': intraday_pcr,
+        'total_put_oi': total_put_oi,
+        'total_call_oi': total_call_oi,
+        'overall_pcr': overall_pcr,
+        'coi_pcr': coi_pcr,
+        'crudeoil_price': crudeoil_price,
+        'crudeoil_change': crudeoil_change,
+        'crudeoil_percent_change': crudeoil_percent_change,
+        'day_high': day_high,
+        'day_low': day_low,
+    }
+
+def calculate_trend(coi_pcr):
+    """Trend based on COI PCR (Column G)"""
+    if coi_pcr != "0" and coi_pcr != "0.00":
+        try:
+            coi_value = float(coi_pcr)
+            if coi_value <= 0.8:
+                return "Bearish Trend"
+            elif coi_value >= 1.2:
+                return "Bullish Trend"
+            else:
+                return "Neutral Trend"
+        except:
+            return "Neutral Trend"
+    return "Neutral Trend"
+
+def find_empty_row(sheet, last_row=2000, priority=sheets_quota.LIVE):
+    """First empty cell in column A from row 18, or the row after the last value"""
+    data_range = sheets_quota.call(priority, 1, sheet.range, f'A{FIRST_DATA_ROW}:A{last_row}')
+
+    for i, cell in enumerate(data_range):
+        if cell.value == '':
+            empty_row = i + FIRST_DATA_ROW
+            print(f"📍 Found empty row at: {empty_row}")
+            return empty_row
+
+    empty_row = len(sheets_quota.call(priority, 1, sheet.col_values, 1)) + 1
+    print(f"📍 No empty rows found, appending to row: {empty_row}")
+    return empty_row
+
+def get_previous_intraday_values(sheet, current_empty_row, priority=sheets_quota.LIVE):
+    """Get previous Intraday Put and Call OI values from the previous row"""
+    previous_put_oi = None
+    previous_call_oi = None
+
+    try:
+        if current_empty_row > FIRST_DATA_ROW:
+            # Previous row is current_empty_row - 1
+            prev_row = current_empty_row - 1
+
+            # Get values from previous row's column B and D
+            prev_put_cell = sheets_quota.call(priority, 1, sheet.cell, prev_row, 2)  # Column B
+            prev_call_cell = sheets_quota.call(priority, 1, sheet.cell, prev_row, 4)  # Column D
+
+            if prev_put_cell.value and prev_put_cell.value != '':
+                # Remove commas and convert to int
+                prev_put_str = prev_put_cell.value.replace(',', '')
+                if prev_put_str.replace('-', '').isdigit():
+                    previous_put_oi = int(prev_put_str)
+                    print(f"📊 Previous Intraday Put OI (Row {prev_row}): {previous_put_oi:,}")
+
+            if prev_call_cell.value and prev_call_cell.value != '':
+                prev_call_str = prev_call_cell.value.replace(',', '')
+                if prev_call_str.replace('-', '').isdigit():
+                    previous_call_oi = int(prev_call_str)
+                    print(f"📊 Previous Intraday Call OI (Row {prev_row}): {previous_call_oi:,}")
+        else:
+            print(f"📊 First data row ({FIRST_DATA_ROW}), no previous values available")
+
+    except Exception as e:
+        print(f"⚠️ Error getting previous intraday values: {e}")
+        previous_put_oi = None
+        previous_call_oi = None
+
+    return previous_put_oi, previous_call_oi
+
+def format_difference(label, current, previous):
+    """Signed difference against the previous row, "0" when there is no previous value"""
+    if previous is None:
+        print(f"⚠️ No previous Intraday {label} OI value found, setting difference to 0")
+        return "0"
+    difference = f"{current - previous:+,}".replace('+-', '-')
+    print(f"📊 {label} OI Difference: {current:,} - {previous:,} = {difference}")
+    return difference
+
+def build_row(data, current_time, previous_put_oi, previous_call_oi):
+    """Columns A to R for one minute"""
+    # 🔥 Trend and Observation based on COI PCR (Column G)
+    # A: Timestamp                    J: Observation (based on COI PCR)
+    # B: Intraday Put Change OI       K: Put OI (Total)
+    # C: Put Change (Difference)      L: Call OI (Total)
+    # D: Intraday Call Change OI      M: PCR (Overall)
+    # E: Call Change (Difference)     N: CrudeOilM Price
+    # F: Change %                     O: CHG
+    # G: COI PCR (BASE for Trend)     P: CHG %
+    # H: Intraday PCR                 Q: Day High
+    # I: Trend (based on COI PCR)     R: Day Low
+    put_oi = data['put_oi']
+    call_oi = data['call_oi']
+    coi_pcr = data['coi_pcr']
+
+    put_difference = format_difference("Put", put_oi, previous_put_oi)
+    call_difference = format_difference("Call", call_oi, previous_call_oi)
+
+    exact_minute_time = current_time.replace(second=0, microsecond=0)
+    timestamp = exact_minute_time.strftime("%Y-%m-%d %H:%M:%S IST")
+
+    change_percent = f"Call Change OI is higher by {((abs(call_oi) - abs(put_oi)) / abs(put_oi) * 100):.2f}%" if put_oi else "0%"
+
+    trend = calculate_trend(coi_pcr)
+
+    # 🔥 Observation based on COI PCR
+    observation = f"COI PCR {coi_pcr} indicates {trend.lower()}."
+
+    return [
+        timestamp,                              # A - Timestamp
+        f"{put_oi:,}",                          # B - Intraday Put Change OI
+        put_difference,                         # C - Put Change (Difference)
+        f"{call_oi:,}",                         # D - Intraday Call Change OI
+        call_difference,                        # E - Call Change (Difference)
+        change_percent,                         # F - Change %
+        coi_pcr,                                # G - COI PCR (BASE for Trend)
+        data['intraday_pcr'],                   # H - Intraday PCR
+        trend,                                  # I - Trend (based on COI PCR)
+        observation,                            # J - Observation (based on COI PCR)
+        f"{data['total_put_oi']:,}",            # K - Put OI (Total)
+        f"{data['total_call_oi']:,}",           # L - Call OI (Total)
+        data['overall_pcr'],                    # M - PCR (Overall)
+        data['crudeoil_price'],                 # N - CrudeOilM Price
+        data['crudeoil_change'],                # O - CHG
+        f"{data['crudeoil_percent_change']}%",  # P - CHG %
+        data['day_high'],                       # Q - Day High
+        data['day_low']                         # R - Day Low
+    ]
+
+def a1_range(worksheet, cells):
+    title = worksheet.title.replace("'", "''")
+    return f"'{title}'!{cells}"
+
+def write_row(sheet, row_number, new_row, summary_rows=None, priority=sheets_quota.LIVE, extra_data=()):
+    """Columns A to R, the summary block and any rollup rows in one spreadsheet request"""
+    data = [{'range': a1_range(sheet, f"A{row_number}:R{row_number}"), 'values': [new_row]}]
+    if summary_rows is not None:
+        data.append({'range': a1_range(sheet, session_summary.SUMMARY_RANGE), 'values': summary_rows})
+    data.extend(extra_data)
+    body = {'valueInputOption': 'USER_ENTERED', 'data': data}
+    sheets_quota.call(priority, 1, sheet.spreadsheet.values_batch_update, body)
+
+def rollup_data(symbol, rollup_rows, priority=sheets_quota.LIVE):
+    """Ranges for closed rollup buckets; returns (data, {key: next_row}) to commit after the write"""
+    data = []
+    next_rows = {}
+    for label, rows in rollup_rows.items():
+        worksheet, row_number = next_rollup_row(symbol, label, priority)
+        first_row = row_number
+        last_row = row_number + len(rows) - 1
+        if last_row > worksheet.row_count:
+            # values_batch_update does not extend the grid, and a range past it fails the whole request
+            extra = last_row - worksheet.row_count + ROLLUP_GROW_ROWS
+            print(f"📏 Growing '{worksheet.title}' by {extra} rows")
+            sheets_quota.call(priority, 1, worksheet.add_rows, extra)
+        data.append({
+            'range': a1_range(worksheet, f"A{first_row}:K{last_row}"),
+            'values': rows,
+        })
+        next_rows[(symbol, label)] = last_row + 1
+    return data, next_rows
+
+def queue_rollup_rows(symbol, closed):
+    with _rollup_lock:
+        pending = _rollup_pending.setdefault(symbol, {})
+        for label, rows in closed.items():
+            pending.setdefault(label, []).extend(rows)
+
+def pending_rollup_rows(symbol):
+    """Copy of the closed rollup rows still waiting to be written"""
+    with _rollup_lock:
+        return {label: list(rows) for label, rows in _rollup_pending.get(symbol, {}).items() if rows}
+
+def commit_rollup_rows(symbol, written, next_rows):
+    """After a successful write: advance the next free rows and drop the rows that went out"""
+    with _rollup_lock:
+        _rollup_next_row.update(next_rows)
+        pending = _rollup_pending.get(symbol, {})
+        for label, rows in written.items():
+            del pending[label][:len(rows)]
+
+def fetch_snapshot(symbol, budget):
+    """Fetch and parse within budget; None when the source is down or the breaker is open"""
+    breaker = get_breaker(symbol)
+    if not breaker.allow_request():
+        print(f"🚫 Circuit breaker open for {symbol}, not fetching")
+        return None
+
+    try:
+        with budget.stage('fetch') as stage:
+            all_text = fetch_with_retry(symbol, stage)
+        with budget.stage('parse'):
+            try:
+                data = parse_pcr_data(all_text, symbol)
+            except Exception as e:
+                raise resilience.SourceUnavailable(f"parse failed: {e}")
+        if not data['complete']:
+            raise resilience.SourceUnavailable("Put/Call OI Chg not found on page")
+    except resilience.SourceUnavailable as e:
+        print(f"❌ Source unavailable for {symbol}: {e}")
+        breaker.record_failure()
+        return None
+
+    breaker.record_success()
+    return data
+
+def get_dispatcher():
+    """Sink dispatcher for this process, built from PCR_SINKS on first use"""
+    if _dispatcher is None:
+        configure_sinks()
+    return _dispatcher
+
+def configure_sinks(spec=None, on_complete=None):
+    """(Re)build the sinks; spec defaults to $PCR_SINKS, then Sheets only"""
+    global _dispatcher
+    import sinks
+
+    if spec is None:
+        spec = os.environ.get('PCR_SINKS', 'sheets')
+    _dispatcher = sinks.SinkDispatcher(sinks.build_sinks(spec), on_complete=on_complete)
+    print(f"📤 Sinks: {', '.join(sink.name for sink in _dispatcher.sinks)}")
+    if _alert_channels is None:
+        configure_alerts()
+    return _dispatcher
+
+def has_sheets_sink():
+    return any(sink.name == 'sheets' for sink in get_dispatcher().sinks)
+
+def load_previous_from_sheet(symbol, last_row, priority=sheets_quota.LIVE):
+    """Previous Intraday Put/Call OI from the last written sheet row"""
+    if not has_sheets_sink():
+        return None, None
+    sheet = get_worksheet(symbol, priority)
+    empty_row = find_empty_row(sheet, last_row, priority)
+    return get_previous_intraday_values(sheet, empty_row, priority)
+
+def read_session_rows(symbol, current_time, priority=sheets_quota.LIVE):
+    """Rows A-R already written for today's session, oldest first (one range read)"""
+    sheet = get_worksheet(symbol, priority)
+    rows = sheets_quota.call(priority, 1, sheet.get, f"A{FIRST_DATA_ROW}:R")
+    today = current_time.strftime("%Y-%m-%d")
+    return [row for row in rows if row and row[0].startswith(today)]
+
+def parse_sheet_row(row, current_time):
+    """(minute_time, data, trend, stale) for a row read back from the sheet, None if unreadable"""
+    row = list(row) + [""] * (18 - len(row))  # Sheets drops trailing empty cells of A-R
+    try:
+        stamp = datetime.strptime(row[0][:19], "%Y-%m-%d %H:%M:%S")
+        data = {
+            'put_oi': int(row[1].replace(',', '')),
+            'call_oi': int(row[3].replace(',', '')),
+            'coi_pcr': row[6],
+            'intraday_pcr': row[7],
+            'crudeoil_price': row[13],
+        }
+    except ValueError:
+        return None
+    # Keep current_time's tzinfo (replace(tzinfo=...) with a pytz zone would use LMT)
+    minute_time = current_time.replace(year=stamp.year, month=stamp.month, day=stamp.day,
+                                       hour=stamp.hour, minute=stamp.minute, second=0, microsecond=0)
+    return minute_time, data, row[8], row[9].startswith(STALE_MARKER)
+
+def restore_session(symbol, current_time, stage, priority=sheets_quota.LIVE):
+    """Rebuild the session state from the sheet after a restart, a failover or a --once run
+
+    Today's rows are read with one range read and replayed into the summary and the
+    rollup buckets (closed buckets were written when they closed, so they are not
+    queued again); the last good row seeds the alert rules. If the rows cannot be read, the summary is marked partial and
+    rollup buckets that started earlier are skipped instead of being written short.
+    """
+    _restored.add(symbol)
+    summary = get_summary(symbol)
+    rollup_set = get_rollups(symbol)
+    minute_time = current_time.replace(second=0, microsecond=0)
+
+    if not has_sheets_sink():
+        return
+    try:
+        rows = resilience.call_with_deadline(max(1.0, stage.remaining()), read_session_rows,
+                                             symbol, current_time, priority)
+    except Exception as e:
+        print(f"⚠️ Could not read earlier rows to rebuild the session: {e}")
+        summary.partial = True
+        rollup_set.skip_partial(minute_time)
+        return
+
+    restored = 0
+    last = None
+    last_good = None
+    for row in rows:
+        parsed = parse_sheet_row(row, current_time)
+        if parsed is None:
+            continue
+        row_time, data, trend, stale = parsed
+        summary.update(data, trend, row_time, stale)
+        rollup_set.update(row_time, data, trend, stale)
+        last = parsed
+        if not stale:
+            last_good = parsed
+        restored += 1
+
+    if last is not None and symbol not in _previous:
+        # Saves reading the row above again
+        _previous[symbol] = (last[1]['put_oi'], last[1]['call_oi'])
+    if last_good is not None:
+        # Trend flips and COI PCR crossings are measured from the last row, not from scratch
+        try:
+            _, data, trend, _ = last_good
+            get_alert_engine(symbol).prime(alerts.snapshot_values(data, trend, None, None))
+        except Exception as e:
+            print(f"⚠️ Could not seed alert rules for {symbol}: {e}")
+    if restored:
+        print(f"📊 Session state for {symbol} rebuilt from {restored} earlier row(s)")
+
+def run_update(current_time, symbol=DEFAULT_SYMBOL, last_row=2000, budget=None, owns_session=True,
+               priority=sheets_quota.LIVE):
+    """Fetch and parse within the tick budget, then hand the row to every sink
+
+    Sink writes run in the background; the returned 'futures' map sink names to them.
+    owns_session=False (manual updates from a worker that is not the scheduler)
+    reads the previous values from the sheet and leaves the summary block alone.
+    priority orders its Sheets requests in the quota governor (see sheets_quota.py).
+    """
+    check_symbol(symbol)
+    if budget is None:
+        budget = resilience.TickBudget()
+    if owns_session:
+        sync_session(symbol)
+
+    data = fetch_snapshot(symbol, budget)
+    stale = data is None
+    if stale:
+        last_good = _last_good.get(symbol)
+        if last_good is None:
+            raise resilience.SourceUnavailable(f"no data for {symbol} and no snapshot to carry forward")
+        data = last_good['data']
+        budget.pending = ['write']
+    else:
+        _last_good[symbol] = {'data': data, 'time': current_time}
+
+    with budget.stage('write') as stage:
+        if owns_session and symbol not in _restored:
+            restore_session(symbol, current_time, stage, priority)
+
+        # Sheets is only read when there is no previous snapshot in memory (start of day / restart)
+        if owns_session and symbol in _previous:
+            previous_put_oi, previous_call_oi = _previous[symbol]
+        else:
+            previous_put_oi, previous_call_oi = resilience.call_with_deadline(
+                max(1.0, stage.remaining()), load_previous_from_sheet, symbol, last_row, priority
+            )
+
+        new_row = build_row(data, current_time, previous_put_oi, previous_call_oi)
+        if stale:
+            # Flag the row instead of writing 0 defaults over real data
+            snapshot_time = last_good['time'].strftime("%H:%M")
+            new_row[9] = f"{STALE_MARKER}: source unavailable, carrying forward {snapshot_time} snapshot"
+
+        print(f"📝 G (COI PCR)={new_row[6]} → I (Trend)={new_row[8]}, J (Observation)={new_row[9]}")
+        print(f"📝 H (Intraday PCR)={new_row[7]} (for reference only)")
+
+        summary_rows = None
+        if owns_session:
+            # Alerts go out now, not after the sheet write
+            if not stale:
+                try:
+                    values = alerts.snapshot_values(data, new_row[8], previous_put_oi, previous_call_oi)
+                    get_alert_engine(symbol).evaluate(symbol, values, new_row[0])
+                except Exception as e:
+                    # Alerting is optional; it must never keep the row from the sinks
+                    print(f"⚠️ Alert evaluation error for {symbol}: {e}")
+
+            _previous[symbol] = (data['put_oi'], data['call_oi'])
+            summary = get_summary(symbol)
+            summary.update(data, new_row[8], current_time.replace(second=0, microsecond=0), stale)
+            summary_rows = summary.rows()
+            # Closed buckets wait in the pending list until a Sheets write takes them
+            closed = get_rollups(symbol).update(
+                current_time.replace(second=0, microsecond=0), data, new_row[8], stale,
+                final=is_last_market_minute(current_time)
+            )
+            if has_sheets_sink():
+                queue_rollup_rows(symbol, closed)
+
+        futures = get_dispatcher().dispatch({
+            'symbol': symbol,
+            'values': new_row,
+            'stale': stale,
+            'summary_rows': summary_rows,
+            'last_row': last_row,
+            'priority': priority,
+            # Sink writes of a profiled tick are profiled too (None when profiling is off)
+            'profile': tick_profiler.active_capture,
+        })
+
+    print(f"⏱️ Tick took {budget.elapsed():.1f}s of {budget.total:.0f}s budget "
+          + ", ".join(f"{k}={v:.1f}s" for k, v in budget.timings.items()))
+
+    return {
+        'values': new_row,
+        'data': data,
+        'stale': stale,
+        'futures': futures,
+        'previous_put_oi': previous_put_oi,
+        'previous_call_oi': previous_call_oi,
+    }
@@ -0,0 +1,131 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Whole tick (fetch + parse + write) must finish inside its minute
+TICK_BUDGET_SECONDS = float(os.environ.get('PCR_TICK_BUDGET', 45))
+
+# Relative share of the remaining budget each stage may use.
+# Time a stage leaves unused rolls over to the stages after it.
+STAGE_SHARES = {'fetch': 5, 'parse': 1, 'write': 4}
+
+# Circuit breaker: open after this many consecutive source failures ...
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('PCR_BREAKER_FAILURES', 3))
+# ... and try the source again after this many seconds
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('PCR_BREAKER_COOLDOWN', 180))
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class SourceUnavailable(Exception):
+    """Fetch or parse failed; the tick should fall back to the last good snapshot"""
+    pass
+
+
+class TickBudget:
+    """Time budget for one tick, split across the fetch, parse and write stages"""
+
+    def __init__(self, total=TICK_BUDGET_SECONDS, shares=STAGE_SHARES):
+        self.total = total
+        self.shares = dict(shares)
+        self.started = time.monotonic()
+        self.pending = list(shares)
+        self.timings = {}
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        return max(0.0, self.total - self.elapsed())
+
+    def allot(self, stage):
+        """Seconds this stage may use out of what is left"""
+        pending_shares = sum(self.shares[s] for s in self.pending) or 1
+        return self.remaining() * self.shares.get(stage, 0) / pending_shares
+
+    def stage(self, stage):
+        return _Stage(self, stage)
+
+
+class _Stage:
+    def __init__(self, budget, name):
+        self.budget = budget
+        self.name = name
+        self.allotted = budget.allot(name)
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        took = time.monotonic() - self.started
+        self.budget.timings[self.name] = took
+        if self.name in self.budget.pending:
+            self.budget.pending.remove(self.name)
+        if took > self.allotted:
+            print(f"⏱️ Stage '{self.name}' took {took:.1f}s (budget {self.allotted:.1f}s)")
+        return False
+
+    def remaining(self):
+        return max(0.0, self.allotted - (time.monotonic() - self.started))
+
+
+def call_with_deadline(seconds, fn, *args, **kwargs):
+    """Run fn on a helper thread and stop waiting for it after `seconds`
+
+    The call itself cannot be interrupted; it finishes in the background (bounded
+    by the client's own timeout) while the caller moves on with BudgetExceeded.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deadline")
+    try:
+        future = executor.submit(fn, *args, **kwargs)
+        done, _ = wait([future], timeout=seconds)
+    finally:
+        executor.shutdown(wait=False)
+    if not done:
+        raise BudgetExceeded(f"{getattr(fn, '__name__', 'call')} took longer than {seconds:.1f}s")
+    return future.result()
+
+
+class CircuitBreaker:
+    """Stops hitting a failing source for a while after repeated failures"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self):
+        """False while open; a half-open breaker lets one trial request through"""
+        return self.state != self.OPEN
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print(f"✅ Circuit breaker '{self.name}' closed, source recovered")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            print(f"🚫 Circuit breaker '{self.name}' OPEN after {self.failures} failures, "
+                  f"retrying in {self.cooldown:.0f}s")
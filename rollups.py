@@ -0,0 +1,156 @@
+from datetime import timedelta
+
+# (minutes, label) - each timeframe gets its own worksheet, e.g. PCR_Data_Live_5m
+TIMEFRAMES = [(5, '5m'), (15, '15m'), (60, '1h')]
+
+HEADER = [
+    "Bucket Start", "Bucket End", "Last COI PCR", "Net Put OI Change", "Net Call OI Change",
+    "Open", "High", "Low", "Close", "Dominant Trend", "Minutes"
+]
+
+
+class Bucket:
+    def __init__(self, start, minutes, base_put_oi, base_call_oi):
+        self.start = start
+        self.end = start + timedelta(minutes=minutes)
+        self.base_put_oi = base_put_oi
+        self.base_call_oi = base_call_oi
+        self.last_put_oi = None
+        self.last_call_oi = None
+        self.last_coi_pcr = None
+        self.open = None
+        self.high = None
+        self.low = None
+        self.close = None
+        self.trend_minutes = {}
+        self.count = 0
+
+    def add(self, data, trend):
+        if self.base_put_oi is None:
+            self.base_put_oi = data['put_oi']
+            self.base_call_oi = data['call_oi']
+        self.last_put_oi = data['put_oi']
+        self.last_call_oi = data['call_oi']
+
+        if data['coi_pcr'] not in ("0", "0.00"):
+            self.last_coi_pcr = data['coi_pcr']
+
+        try:
+            price = int(data['crudeoil_price'])
+        except (TypeError, ValueError):
+            price = 0
+        if price:
+            if self.open is None:
+                self.open = price
+            self.high = price if self.high is None else max(self.high, price)
+            self.low = price if self.low is None else min(self.low, price)
+            self.close = price
+
+        self.trend_minutes[trend] = self.trend_minutes.get(trend, 0) + 1
+        self.count += 1
+
+    def row(self):
+        def change(last, base):
+            if last is None or base is None:
+                return "0"
+            return f"{last - base:+,}".replace('+-', '-')
+
+        def price(value):
+            return str(value) if value is not None else "0"
+
+        dominant = max(self.trend_minutes, key=self.trend_minutes.get) if self.trend_minutes else "-"
+        return [
+            self.start.strftime("%Y-%m-%d %H:%M IST"),
+            self.end.strftime("%H:%M"),
+            self.last_coi_pcr or "-",
+            change(self.last_put_oi, self.base_put_oi),
+            change(self.last_call_oi, self.base_call_oi),
+            price(self.open),
+            price(self.high),
+            price(self.low),
+            price(self.close),
+            dominant,
+            self.count,
+        ]
+
+
+class Rollup:
+    """One timeframe, updated incrementally from minute snapshots
+
+    A bucket closes on its last minute (or, if that minute was missed, when the
+    first snapshot of a later bucket arrives) and its row is returned for writing.
+    """
+
+    def __init__(self, minutes, label):
+        self.minutes = minutes
+        self.label = label
+        self.reset()
+
+    def reset(self):
+        self.bucket = None
+        # Intraday OI at the end of the previous bucket, so net change spans the whole bucket
+        self.last_put_oi = None
+        self.last_call_oi = None
+        # Buckets starting before this minute are incomplete (earlier minutes were never seen)
+        self.complete_from = None
+
+    def bucket_start(self, minute_time):
+        midnight = minute_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        minute_of_day = minute_time.hour * 60 + minute_time.minute
+        return midnight + timedelta(minutes=minute_of_day - minute_of_day % self.minutes)
+
+    def update(self, minute_time, data, trend, stale=False, final=False):
+        """Fold in one minute; returns the rows of any buckets that closed
+
+        final=True (last minute of the session) closes the open bucket early.
+        """
+        closed = []
+        start = self.bucket_start(minute_time)
+
+        if self.bucket is not None and self.bucket.start != start:
+            closed.append(self._close())
+
+        if not stale:
+            if self.bucket is None:
+                self.bucket = Bucket(start, self.minutes, self.last_put_oi, self.last_call_oi)
+            self.bucket.add(data, trend)
+            self.last_put_oi = data['put_oi']
+            self.last_call_oi = data['call_oi']
+
+        if self.bucket is not None and (final or minute_time + timedelta(minutes=1) >= self.bucket.end):
+            closed.append(self._close())
+
+        return [row for row in closed if row is not None]
+
+    def _close(self):
+        bucket = self.bucket
+        self.bucket = None
+        if self.complete_from is not None and bucket.start < self.complete_from:
+            print(f"⚠️ Skipping partial {self.label} bucket {bucket.start.strftime('%H:%M')}")
+            return None
+        return bucket.row()
+
+
+class RollupSet:
+    """All timeframes for one symbol"""
+
+    def __init__(self, timeframes=TIMEFRAMES):
+        self.rollups = [Rollup(minutes, label) for minutes, label in timeframes]
+
+    def reset(self):
+        for rollup in self.rollups:
+            rollup.reset()
+
+    def skip_partial(self, minute_time):
+        """Drop the rows of buckets that started before minute_time instead of writing them short"""
+        for rollup in self.rollups:
+            rollup.complete_from = minute_time
+
+    def update(self, minute_time, data, trend, stale=False, final=False):
+        """{label: [rows]} for the buckets that closed with this minute"""
+        closed = {}
+        for rollup in self.rollups:
+            rows = rollup.update(minute_time, data, trend, stale, final)
+            if rows:
+                closed[rollup.label] = rows
+        return closed
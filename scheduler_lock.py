@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - fall back to a lock file with a heartbeat
+    fcntl = None
+
+# Lock and shared state live next to each other so every worker on the box sees them
+STATE_DIR = os.environ.get('PCR_STATE_DIR', tempfile.gettempdir())
+LOCK_FILE = os.path.join(STATE_DIR, 'pcr_scheduler.lock')
+STATE_FILE = os.path.join(STATE_DIR, 'pcr_shared_state.json')
+SHEET_LOCK_FILE = os.path.join(STATE_DIR, 'pcr_sheet_write.lock')
+
+# Followers retry this often, so a dead leader is replaced well within one minute tick
+HEARTBEAT_INTERVAL = 5
+# Lock-file fallback only: a heartbeat older than this means the leader is gone
+HEARTBEAT_TIMEOUT = 20
+
+
+class SchedulerLock:
+    """Leader lock so exactly one worker process runs the background jobs"""
+
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self.fd = None
+        self.is_leader = False
+
+    def try_acquire(self):
+        """Non-blocking attempt to become leader; returns True while we hold the lock"""
+        if self.is_leader:
+            if fcntl is None and not self._owns_lock_file():
+                self._step_down()
+                return False
+            self.heartbeat()
+            return True
+
+        if fcntl is not None:
+            acquired = self._acquire_flock()
+        else:
+            acquired = self._acquire_lock_file()
+
+        if acquired:
+            self.is_leader = True
+            self.heartbeat()
+        return acquired
+
+    def _acquire_flock(self):
+        # The kernel drops the lock when the holding process dies, so failover needs no cleanup
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+
+    def _acquire_lock_file(self):
+        try:
+            stale = os.stat(self.path)
+        except FileNotFoundError:
+            stale = None
+        except OSError:
+            return False
+
+        if stale is not None:
+            age = time.time() - stale.st_mtime
+            if age < HEARTBEAT_TIMEOUT:
+                return False
+            if not self._claim_stale_lock(stale):
+                return False
+            print(f"⚠️ Scheduler lock heartbeat was {age:.0f}s old, took over")
+
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        return True
+
+    def _owns_lock_file(self):
+        """Lock-file fallback: False once another worker has taken the lock file over"""
+        try:
+            return os.fstat(self.fd).st_ino == os.stat(self.path).st_ino
+        except OSError:
+            return False
+
+    def _step_down(self):
+        print(f"⚠️ Worker {os.getpid()} lost the scheduler lock file, stepping down")
+        # The file at self.path belongs to the new leader now, so only our handle is closed
+        os.close(self.fd)
+        self.fd = None
+        self.is_leader = False
+
+    def _claim_stale_lock(self, stale):
+        """Move the stale lock file out of the way; only one follower can win the rename
+
+        Checking the age and then removing the file is not atomic: another follower
+        may already have replaced it with a fresh lock, which must not be removed.
+        """
+        claimed = f"{self.path}.stale.{os.getpid()}"
+        try:
+            os.rename(self.path, claimed)
+        except OSError:
+            return False
+
+        current = os.stat(claimed)
+        if (current.st_ino, current.st_mtime) != (stale.st_ino, stale.st_mtime):
+            # Not the file we judged stale - a new leader's lock or a fresh heartbeat; put it back
+            try:
+                os.rename(claimed, self.path)
+            except OSError as e:
+                print(f"❌ Could not restore scheduler lock file: {e}")
+            return False
+
+        os.remove(claimed)
+        return True
+
+    def heartbeat(self):
+        """Record the leader pid and time in the lock file"""
+        if self.fd is None:
+            return
+        payload = f"{os.getpid()} {time.time():.0f}\n".encode()
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.ftruncate(self.fd, 0)
+        os.write(self.fd, payload)
+        if fcntl is None:
+            os.utime(self.path, None)
+
+    def release(self):
+        if self.fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        if fcntl is None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self.fd = None
+        self.is_leader = False
+
+
+def read_shared_state():
+    """State published by the leader, readable from any worker"""
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive flock on path (no-op where fcntl is unavailable)"""
+    guard = None
+    if fcntl is not None:
+        guard = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(guard, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        if guard is not None:
+            fcntl.flock(guard, fcntl.LOCK_UN)
+            os.close(guard)
+
+
+def _write_shared_state(state):
+    tmp_path = f"{STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def update_shared_state(**fields):
+    """Merge fields into the shared state file (atomic replace, serialized across workers)"""
+    with _file_lock(STATE_FILE + '.lock'):
+        state = read_shared_state()
+        state.update(fields)
+        _write_shared_state(state)
+        return state
+
+
+def try_claim(flag, ttl):
+    """Set a shared in-progress flag unless another worker holds a claim younger than ttl seconds"""
+    with _file_lock(STATE_FILE + '.lock'):
+        state = read_shared_state()
+        claim = state.get(flag)
+        if claim and claim['pid'] != os.getpid() and time.time() - claim['since'] < ttl:
+            return False
+        state[flag] = {'pid': os.getpid(), 'since': time.time()}
+        _write_shared_state(state)
+        return True
+
+
+def release_claim(flag):
+    with _file_lock(STATE_FILE + '.lock'):
+        state = read_shared_state()
+        claim = state.get(flag)
+        if claim and claim['pid'] == os.getpid():
+            state[flag] = None
+            _write_shared_state(state)
+
+
+_sheet_lock = threading.Lock()
+
+
+@contextmanager
+def sheet_write_lock():
+    """Held from finding the empty row until it is written (or the sheet is cleared) by any worker"""
+    with _sheet_lock:
+        with _file_lock(SHEET_LOCK_FILE):
+            yield
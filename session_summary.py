@@ -0,0 +1,119 @@
+TRENDS = ["Bullish Trend", "Neutral Trend", "Bearish Trend"]
+
+# Header area above the data (data starts at row 18)
+SUMMARY_RANGE = "A1:B17"
+SUMMARY_ROWS = 17
+
+
+class SessionSummary:
+    """Intraday statistics kept up to date one snapshot at a time (O(1) per update)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.session_start = None
+        # True when earlier rows of the session could not be read back after a restart
+        self.partial = False
+        self.last_time = None
+        self.updates = 0
+        self.stale_updates = 0
+
+        self.coi_count = 0
+        self.coi_sum = 0.0
+        self.coi_min = None
+        self.coi_max = None
+        self.coi_last = None
+
+        self.first_put_oi = None
+        self.first_call_oi = None
+        self.last_put_oi = None
+        self.last_call_oi = None
+
+        self.trend = None
+        self.trend_minutes = {trend: 0.0 for trend in TRENDS}
+        self.last_flip = None
+
+    def update(self, data, trend, current_time, stale=False):
+        """Fold one minute snapshot into the running statistics"""
+        if self.session_start is None:
+            self.session_start = current_time
+
+        # Time since the previous snapshot counts towards the trend that was showing
+        if self.last_time is not None and self.trend is not None:
+            minutes = (current_time - self.last_time).total_seconds() / 60
+            self.trend_minutes[self.trend] = self.trend_minutes.get(self.trend, 0.0) + minutes
+
+        if self.trend is not None and trend != self.trend:
+            self.last_flip = (current_time, self.trend, trend)
+        self.trend = trend
+        self.last_time = current_time
+        self.updates += 1
+
+        if stale:
+            # Carried-forward values would skew the statistics
+            self.stale_updates += 1
+            return
+
+        try:
+            coi_value = float(data['coi_pcr'])
+        except (TypeError, ValueError):
+            coi_value = None
+        if coi_value is not None and data['coi_pcr'] not in ("0", "0.00"):
+            self.coi_count += 1
+            self.coi_sum += coi_value
+            self.coi_last = coi_value
+            self.coi_min = coi_value if self.coi_min is None else min(self.coi_min, coi_value)
+            self.coi_max = coi_value if self.coi_max is None else max(self.coi_max, coi_value)
+
+        if self.first_put_oi is None:
+            self.first_put_oi = data['put_oi']
+            self.first_call_oi = data['call_oi']
+        self.last_put_oi = data['put_oi']
+        self.last_call_oi = data['call_oi']
+
+    @property
+    def coi_mean(self):
+        return self.coi_sum / self.coi_count if self.coi_count else None
+
+    def rows(self):
+        """Label/value pairs for the summary block, padded to SUMMARY_ROWS"""
+        def fmt_pcr(value):
+            return f"{value:.2f}" if value is not None else "-"
+
+        def fmt_change(last, first):
+            if last is None or first is None:
+                return "-"
+            return f"{last - first:+,}".replace('+-', '-')
+
+        def fmt_time(t):
+            return t.strftime("%H:%M") if t is not None else "-"
+
+        if self.last_flip is not None:
+            flip_time, from_trend, to_trend = self.last_flip
+            last_flip = f"{fmt_time(flip_time)} {from_trend} → {to_trend}"
+        else:
+            last_flip = "-"
+
+        rows = [
+            ["📊 Session Summary", f"since {fmt_time(self.session_start)} IST"
+                                   + (" (partial - earlier rows not included)" if self.partial else "")],
+            ["Last Update", fmt_time(self.last_time)],
+            ["Snapshots (stale)", f"{self.updates} ({self.stale_updates})"],
+            ["COI PCR Last", fmt_pcr(self.coi_last)],
+            ["COI PCR Min", fmt_pcr(self.coi_min)],
+            ["COI PCR Max", fmt_pcr(self.coi_max)],
+            ["COI PCR Mean", fmt_pcr(self.coi_mean)],
+            ["Current Trend", self.trend or "-"],
+        ]
+        for trend in TRENDS:
+            rows.append([f"Minutes {trend}", f"{self.trend_minutes[trend]:.0f}"])
+        rows += [
+            ["Last Trend Flip", last_flip],
+            ["Cumulative Put OI Change", fmt_change(self.last_put_oi, self.first_put_oi)],
+            ["Cumulative Call OI Change", fmt_change(self.last_call_oi, self.first_call_oi)],
+        ]
+
+        while len(rows) < SUMMARY_ROWS:
+            rows.append(["", ""])
+        return rows[:SUMMARY_ROWS]
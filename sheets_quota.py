@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+
+import scheduler_lock
+
+try:
+    import fcntl
+except ImportError:  # Windows - bucket is per process only
+    fcntl = None
+
+# Priorities (lower goes first)
+LIVE = 0
+MANUAL = 1
+RESET = 2
+PRIORITY_NAMES = {LIVE: 'live', MANUAL: 'manual', RESET: 'reset'}
+
+# Sheets API allows 60 requests per minute per user; stay a little under it
+REQUESTS_PER_MINUTE = int(os.environ.get('PCR_SHEETS_QUOTA_PER_MIN', 55))
+
+# Share of the bucket a priority may not dip into. Workers only order their own
+# queue, so this is what keeps the last tokens for live writes across processes.
+RESERVE = {LIVE: 0.0, MANUAL: 0.2, RESET: 0.4}
+
+# Back-off retries when Sheets still answers 429
+MAX_429_RETRIES = 3
+
+BUCKET_FILE = os.path.join(scheduler_lock.STATE_DIR, 'pcr_sheets_quota.json')
+
+
+class QuotaGovernor:
+    """Token bucket shared by every Sheets caller; requests queue by priority instead of failing"""
+
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE, bucket_file=BUCKET_FILE):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.bucket_file = bucket_file if fcntl is not None else None
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.bucket_lock = threading.Lock()
+
+        self.cond = threading.Condition()
+        self.queue = []
+        self.counter = itertools.count()
+        self.granted = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_seconds = {p: 0.0 for p in PRIORITY_NAMES}
+        self.throttled = 0
+        self.recent = deque()
+        # Per thread: [seconds waited so far, monotonic start of the wait in progress or None]
+        self.thread_waits = {}
+
+    def _load(self):
+        if self.bucket_file is None:
+            return
+        try:
+            with open(self.bucket_file) as f:
+                state = json.load(f)
+            self.tokens = state['tokens']
+            self.updated = state['updated']
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def _save(self):
+        if self.bucket_file is None:
+            return
+        tmp_path = f"{self.bucket_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'tokens': self.tokens, 'updated': self.updated}, f)
+        os.replace(tmp_path, self.bucket_file)
+
+    def _with_bucket(self, fn):
+        """Run fn on the refilled bucket, holding the cross-process lock if there is one"""
+        guard = None
+        self.bucket_lock.acquire()
+        if self.bucket_file is not None:
+            guard = os.open(self.bucket_file + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(guard, fcntl.LOCK_EX)
+        try:
+            self._load()
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            result = fn()
+            self._save()
+            return result
+        finally:
+            if guard is not None:
+                fcntl.flock(guard, fcntl.LOCK_UN)
+                os.close(guard)
+            self.bucket_lock.release()
+
+    def _try_take(self, priority, cost):
+        """0 if the tokens were taken, else seconds until they should be available"""
+        def take():
+            floor = self.capacity * RESERVE[priority]
+            if self.tokens - cost >= floor:
+                self.tokens -= cost
+                return 0.0
+            return (cost + floor - self.tokens) / self.rate
+        return self._with_bucket(take)
+
+    def acquire(self, priority=LIVE, cost=1):
+        """Block until `cost` requests may be sent; returns seconds spent waiting"""
+        started = time.monotonic()
+        ticket = (priority, next(self.counter), cost)
+        thread = threading.get_ident()
+
+        with self.cond:
+            self.thread_waits.setdefault(thread, [0.0, None])[1] = started
+            heapq.heappush(self.queue, ticket)
+            self.cond.notify_all()
+            while True:
+                if self.queue[0] is ticket:
+                    wait = self._try_take(priority, cost)
+                    if wait == 0:
+                        heapq.heappop(self.queue)
+                        self.cond.notify_all()
+                        break
+                else:
+                    wait = 1.0
+                self.cond.wait(timeout=min(wait, 1.0))
+
+            waited = time.monotonic() - started
+            self.thread_waits[thread] = [self.thread_waits[thread][0] + waited, None]
+            self.granted[priority] += cost
+            self.wait_seconds[priority] += waited
+            now = time.time()
+            self.recent.extend([now] * cost)
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+
+        if waited > 1:
+            print(f"🚦 Sheets quota: {PRIORITY_NAMES[priority]} request waited {waited:.1f}s")
+        return waited
+
+    def queued_seconds(self, thread):
+        """Total seconds a thread has spent waiting for tokens, including a wait in progress"""
+        with self.cond:
+            waited, since = self.thread_waits.get(thread, (0.0, None))
+            if since is not None:
+                waited += time.monotonic() - since
+            return waited
+
+    def drain(self):
+        """Sheets said 429 anyway - empty the bucket so everyone backs off"""
+        def empty():
+            self.tokens = 0.0
+        self._with_bucket(empty)
+        self.throttled += 1
+
+    def usage(self):
+        """Quota gauge"""
+        tokens = self._with_bucket(lambda: self.tokens)
+        with self.cond:
+            now = time.time()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self.queue:
+                waiting[PRIORITY_NAMES[priority]] += 1
+            return {
+                'per_minute': int(self.capacity),
+                'tokens_available': round(tokens, 1),
+                'usage_percent': round(100 * (1 - tokens / self.capacity), 1),
+                'requests_last_minute': len(self.recent),
+                'waiting': waiting,
+                'granted': {PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+                'wait_seconds': {PRIORITY_NAMES[p]: round(s, 1) for p, s in self.wait_seconds.items()},
+                'throttled_429': self.throttled,
+            }
+
+
+governor = QuotaGovernor()
+
+
+def _is_rate_limited(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 429
+
+
+def call(priority, cost, fn, *args, **kwargs):
+    """Make a Sheets call once the governor allows it, backing off and retrying on 429"""
+    for attempt in range(MAX_429_RETRIES + 1):
+        governor.acquire(priority, cost)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt == MAX_429_RETRIES:
+                raise
+            print(f"🚦 Sheets 429 for {PRIORITY_NAMES[priority]} request, backing off")
+            governor.drain()
@@ -0,0 +1,314 @@
+import os
+import csv
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Column names for A-R, used by the file sinks
+COLUMNS = [
+    "Timestamp", "Intraday Put Change OI", "Put Change", "Intraday Call Change OI",
+    "Call Change", "Change %", "COI PCR", "Intraday PCR", "Trend", "Observation",
+    "Put OI", "Call OI", "PCR", "CrudeOilM Price", "CHG", "CHG %", "Day High", "Day Low"
+]
+
+# A sink with this many writes still queued drops new snapshots instead of piling up
+MAX_PENDING = 5
+
+
+class SinkTimeout(Exception):
+    pass
+
+
+class Sink:
+    """Destination for minute snapshots; write() runs on the sink's own thread
+
+    The dispatcher stops waiting for a write after `timeout` seconds, not counting
+    the time queued_seconds() reports for the writing thread.
+    """
+
+    name = "sink"
+    timeout = 10
+
+    def write(self, snapshot):
+        raise NotImplementedError
+
+    def queued_seconds(self, thread):
+        """Seconds the thread has spent waiting its turn (e.g. for API quota) rather than writing"""
+        return 0.0
+
+
+class SheetsSink(Sink):
+    """Google Sheets live worksheet (row, summary block and closed rollup rows in one request)"""
+
+    name = "sheets"
+    timeout = 40
+
+    def write(self, snapshot):
+        import pcr_pipeline
+        import scheduler_lock
+
+        priority = snapshot.get('priority', pcr_pipeline.sheets_quota.LIVE)
+        sheet = pcr_pipeline.get_worksheet(snapshot['symbol'], priority)
+        # Rollup rows are read at write time so rows from earlier failed or dropped writes go out too
+        rollup_rows = pcr_pipeline.pending_rollup_rows(snapshot['symbol'])
+        try:
+            rollup_data, next_rows = pcr_pipeline.rollup_data(snapshot['symbol'], rollup_rows, priority)
+        except Exception as e:
+            # A broken rollup worksheet must not cost the minute row; the rows stay pending
+            print(f"⚠️ Rollup worksheets unavailable ({e}), writing the minute row only")
+            rollup_rows, rollup_data, next_rows = {}, [], {}
+
+        # Another worker's /update must not pick the same empty row
+        with scheduler_lock.sheet_write_lock():
+            empty_row = pcr_pipeline.find_empty_row(sheet, snapshot.get('last_row', 2000), priority)
+            print(f"📝 Adding {'STALE ' if snapshot['stale'] else ''}data to row {empty_row}"
+                  + (f" + rollups {', '.join(rollup_rows)}" if next_rows else ""))
+            pcr_pipeline.write_row(sheet, empty_row, snapshot['values'], snapshot.get('summary_rows'),
+                                   priority, rollup_data)
+            pcr_pipeline.record_sheet_write(snapshot['symbol'])
+        pcr_pipeline.commit_rollup_rows(snapshot['symbol'], rollup_rows, next_rows)
+        return empty_row
+
+    def queued_seconds(self, thread):
+        # Manual and reset writes queue behind live ones in the governor; that is not a timeout
+        import sheets_quota
+        return sheets_quota.governor.queued_seconds(thread)
+
+
+class JsonlSink(Sink):
+    """One JSON object per line, appended to a local file"""
+
+    name = "jsonl"
+    timeout = 5
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, snapshot):
+        record = dict(zip(COLUMNS, snapshot['values']))
+        record['symbol'] = snapshot['symbol']
+        record['stale'] = snapshot['stale']
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return self.path
+
+
+class CsvSink(Sink):
+    """Rows A-R appended to a local CSV file (header written for a new file)"""
+
+    name = "csv"
+    timeout = 5
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, snapshot):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["Symbol"] + COLUMNS)
+            writer.writerow([snapshot['symbol']] + list(snapshot['values']))
+        return self.path
+
+
+class WebhookSink(Sink):
+    """POST the snapshot as JSON to an HTTP endpoint"""
+
+    name = "webhook"
+    timeout = 5
+
+    def __init__(self, url):
+        self.url = url
+
+    def write(self, snapshot):
+        import requests
+
+        payload = {
+            'symbol': snapshot['symbol'],
+            'stale': snapshot['stale'],
+            'row': dict(zip(COLUMNS, snapshot['values'])),
+        }
+        response = requests.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.status_code
+
+
+def build_sinks(spec):
+    """Sinks from a spec like "sheets,jsonl:/tmp/pcr.jsonl,webhook:http://localhost:8080/pcr" """
+    sinks = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kind, _, target = entry.partition(':')
+        kind = kind.lower()
+        if kind == 'sheets':
+            sinks.append(SheetsSink())
+        elif kind == 'jsonl':
+            sinks.append(JsonlSink(target or 'pcr_snapshots.jsonl'))
+        elif kind == 'csv':
+            sinks.append(CsvSink(target or 'pcr_snapshots.csv'))
+        elif kind == 'webhook':
+            if not target:
+                raise ValueError("webhook sink needs a URL, e.g. webhook:http://localhost:8080/pcr")
+            sinks.append(WebhookSink(target))
+        else:
+            raise ValueError(f"Unknown sink '{kind}'")
+    return sinks
+
+
+class SinkStats:
+    def __init__(self):
+        self.sent = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.pending = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = None
+        self.last_error = None
+        self.last_result = None
+
+    def as_dict(self):
+        completed = self.sent + self.errors
+        return {
+            'sent': self.sent,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'dropped': self.dropped,
+            'pending': self.pending,
+            'last_latency_ms': round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+            'avg_latency_ms': round(self.total_latency / completed * 1000, 1) if completed else None,
+            'max_latency_ms': round(self.max_latency * 1000, 1),
+            'last_error': self.last_error,
+            'last_result': self.last_result,
+        }
+
+
+class SinkDispatcher:
+    """Fans each snapshot out to every sink concurrently, one worker thread per sink
+
+    A slow sink only backs up its own queue; dispatch() itself never blocks.
+    Each write runs on the sink's writer thread and is given up on after sink.timeout
+    (a write that cannot be interrupted keeps its thread, later writes queue behind it
+    and time out too). on_complete(sink_name, result, error) is called from the sink's
+    thread after each delivery.
+    """
+
+    def __init__(self, sinks, on_complete=None):
+        self.sinks = list(sinks)
+        self.on_complete = on_complete
+        self.stats = {sink.name: SinkStats() for sink in self.sinks}
+        self.executors = {
+            sink.name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sink-{sink.name}")
+            for sink in self.sinks
+        }
+        self.writers = {
+            sink.name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sink-write-{sink.name}")
+            for sink in self.sinks
+        }
+        self.lock = threading.Lock()
+
+    def dispatch(self, snapshot):
+        """Queue the snapshot on every sink; returns {sink_name: future}"""
+        futures = {}
+        for sink in self.sinks:
+            stats = self.stats[sink.name]
+            with self.lock:
+                if stats.pending >= MAX_PENDING:
+                    stats.dropped += 1
+                    print(f"⚠️ Sink '{sink.name}' has {stats.pending} writes queued, dropping snapshot")
+                    continue
+                stats.pending += 1
+            if snapshot.get('profile') is not None:
+                snapshot['profile'].begin_write()
+            futures[sink.name] = self.executors[sink.name].submit(self._deliver, sink, snapshot)
+        return futures
+
+    def _deliver(self, sink, snapshot):
+        stats = self.stats[sink.name]
+        started = time.monotonic()
+        result = None
+        error = None
+        timed_out = False
+        capture = snapshot.get('profile')
+        writer_thread = {}
+
+        def run():
+            thread = threading.get_ident()
+            writer_thread['queued'] = (thread, sink.queued_seconds(thread))
+            if capture is not None:
+                return capture.profile(sink.write, snapshot)
+            return sink.write(snapshot)
+
+        write = self.writers[sink.name].submit(run)
+        deadline = started + sink.timeout
+        while True:
+            done, _ = wait([write], timeout=max(0.1, deadline - time.monotonic()))
+            if done:
+                break
+            # Time spent queued for quota extends the deadline
+            queued = 0.0
+            if 'queued' in writer_thread:
+                thread, queued_before = writer_thread['queued']
+                queued = sink.queued_seconds(thread) - queued_before
+            if started + sink.timeout + queued <= time.monotonic():
+                break
+            deadline = started + sink.timeout + queued
+
+        if done:
+            try:
+                result = write.result()
+            except Exception as e:
+                error = e
+        else:
+            # Drops the write if it is still queued behind a stuck one
+            write.cancel()
+            timed_out = True
+            error = SinkTimeout(f"no result after {sink.timeout}s")
+        latency = time.monotonic() - started
+
+        with self.lock:
+            stats.pending -= 1
+            stats.last_latency = latency
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            if timed_out:
+                stats.timeouts += 1
+            if error is None:
+                stats.sent += 1
+                stats.last_result = result
+            else:
+                stats.errors += 1
+                stats.last_error = f"{type(error).__name__}: {error}"
+
+        if error is not None:
+            print(f"❌ Sink '{sink.name}' error after {latency:.2f}s: {error}")
+        if self.on_complete is not None:
+            try:
+                self.on_complete(sink.name, result, error)
+            except Exception as e:
+                print(f"⚠️ Sink completion hook error: {e}")
+        if capture is not None:
+            capture.end_write()
+
+        if error is not None:
+            raise error
+        return result
+
+    def stats_dict(self):
+        with self.lock:
+            return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def wait(self, futures, timeout=None):
+        """Block until the given writes finish (used by --once before exiting)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in futures.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.result(timeout=remaining)
+            except Exception:
+                pass
@@ -0,0 +1,100 @@
+import unittest
+
+import alerts
+
+
+class ThresholdRuleTest(unittest.TestCase):
+    def rule(self, direction='above', level=1.2):
+        return alerts.ThresholdRule('coi', 'coi_pcr', level, direction, hysteresis=0.05, cooldown=0)
+
+    def fire(self, rule, *values):
+        return [rule.evaluate({'coi_pcr': value}) is not None for value in values]
+
+    def test_first_value_is_baseline(self):
+        self.assertEqual(self.fire(self.rule(), 1.3, 1.35), [False, False])
+        self.assertEqual(self.fire(self.rule(), 1.0, 1.25), [False, True])
+
+    def test_rearms_only_past_hysteresis_band(self):
+        rule = self.rule()
+        self.assertEqual(self.fire(rule, 1.0, 1.21, 1.18, 1.2, 1.14, 1.2), [False, True, False, False, False, True])
+
+    def test_below_direction(self):
+        rule = self.rule('below', 0.8)
+        self.assertEqual(self.fire(rule, 0.9, 0.8, 0.82, 0.79, 0.86, 0.75), [False, True, False, False, False, True])
+
+    def test_reset_clears_baseline(self):
+        rule = self.rule()
+        self.fire(rule, 1.0)
+        rule.reset()
+        self.assertEqual(self.fire(rule, 1.3), [False])
+
+    def test_missing_value_is_ignored(self):
+        rule = self.rule()
+        self.assertIsNone(rule.evaluate({'coi_pcr': None}))
+        self.assertEqual(self.fire(rule, 1.3), [False])
+
+
+class CooldownTest(unittest.TestCase):
+    def test_cooldown_suppresses_repeats(self):
+        rule = alerts.SpikeRule('spike', 'put_change', 100, cooldown=60)
+        values = {'put_change': 500}
+        self.assertIsNotNone(rule.check(values, now=0))
+        self.assertIsNone(rule.check(values, now=30))
+        self.assertIsNotNone(rule.check(values, now=61))
+
+    def test_reset_clears_cooldown(self):
+        rule = alerts.SpikeRule('spike', 'put_change', 100, cooldown=60)
+        rule.check({'put_change': -500}, now=0)
+        rule.reset()
+        self.assertIsNotNone(rule.check({'put_change': -500}, now=1))
+
+
+class TrendRuleTest(unittest.TestCase):
+    def rule(self):
+        return alerts.TrendRule('trend', 'coi_pcr', 0.8, 1.2, hysteresis=0.05, cooldown=0)
+
+    def messages(self, rule, *values):
+        return [rule.evaluate({'coi_pcr': value}) for value in values]
+
+    def test_first_value_sets_band(self):
+        self.assertEqual(self.messages(self.rule(), 1.3, 1.3), [None, None])
+
+    def test_hovering_at_band_edge_flips_once(self):
+        fired = [m is not None for m in self.messages(self.rule(), 1.1, 1.21, 1.19, 1.2, 1.18, 1.21)]
+        self.assertEqual(fired, [False, True, False, False, False, False])
+
+    def test_leaving_band_past_margin_flips(self):
+        messages = self.messages(self.rule(), 1.25, 1.14, 0.79)
+        self.assertIsNone(messages[0])
+        self.assertIn("Bullish Trend → Neutral Trend", messages[1])
+        self.assertIn("Neutral Trend → Bearish Trend", messages[2])
+
+    def test_bullish_straight_to_bearish(self):
+        messages = self.messages(self.rule(), 1.3, 0.7)
+        self.assertIn("Bullish Trend → Bearish Trend", messages[1])
+
+
+class AlertEngineTest(unittest.TestCase):
+    def test_prime_sets_state_without_alerting(self):
+        engine = alerts.AlertEngine(channels=[])
+        engine.prime({'coi_pcr': 1.3, 'put_change': None, 'call_change': None})
+        self.assertEqual(engine.evaluate('CRUDEOILM', {'coi_pcr': 1.3}, 't'), [])
+        self.assertEqual(engine.fired, 0)
+
+        fired = engine.evaluate('CRUDEOILM', {'coi_pcr': 1.0}, 't')
+        self.assertEqual([alert['rule'] for alert in fired], ['trend_flip'])
+
+    def test_snapshot_values(self):
+        data = {'coi_pcr': '1.25', 'intraday_pcr': '0.90', 'put_oi': 1500, 'call_oi': 900,
+                'crudeoil_price': '5500'}
+        values = alerts.snapshot_values(data, 'Bullish Trend', 1000, None)
+        self.assertEqual(values['coi_pcr'], 1.25)
+        self.assertEqual(values['put_change'], 500)
+        self.assertIsNone(values['call_change'])
+
+        data['coi_pcr'] = '0.00'
+        self.assertIsNone(alerts.snapshot_values(data, 'Neutral Trend', None, None)['coi_pcr'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime
+
+import rollups
+
+
+def minute(hh, mm):
+    return datetime(2026, 1, 5, hh, mm)
+
+
+def data(put_oi, call_oi, price=5500, coi_pcr="1.10"):
+    return {'put_oi': put_oi, 'call_oi': call_oi, 'crudeoil_price': str(price), 'coi_pcr': coi_pcr}
+
+
+class RollupTest(unittest.TestCase):
+    def setUp(self):
+        self.rollup = rollups.Rollup(5, '5m')
+
+    def feed(self, hh, mm, *args, trend="Bullish Trend", **kwargs):
+        return self.rollup.update(minute(hh, mm), data(*args), trend, **kwargs)
+
+    def test_bucket_closes_on_its_last_minute(self):
+        for mm, price in zip(range(10, 14), (5500, 5520, 5490, 5510)):
+            self.assertEqual(self.feed(10, mm, 1000 + mm, 900, price), [])
+        rows = self.feed(10, 14, 1100, 950, 5505, trend="Bearish Trend")
+        self.assertEqual(rows, [[
+            "2026-01-05 10:10 IST", "10:15", "1.10", "+90", "+50",
+            "5500", "5520", "5490", "5505", "Bullish Trend", 5,
+        ]])
+        self.assertIsNone(self.rollup.bucket)
+
+    def test_missed_last_minute_closes_on_next_bucket(self):
+        self.feed(10, 11, 1000, 900)
+        self.assertEqual(self.feed(10, 13, 1050, 920), [])
+        rows = self.feed(10, 16, 1200, 1000)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][:2], ["2026-01-05 10:10 IST", "10:15"])
+        self.assertEqual(rows[0][-1], 2)
+        self.assertEqual(self.rollup.bucket.start, minute(10, 15))
+
+    def test_net_change_starts_from_previous_bucket(self):
+        for mm in range(10, 15):
+            self.feed(10, mm, 1000 + mm, 900)
+        rows = []
+        for mm in range(15, 20):
+            rows += self.feed(10, mm, 1100, 850 + mm)
+        # Base is the previous bucket's last minute (1014 / 900), not this bucket's first
+        self.assertEqual(rows[0][3:5], ["+86", "-31"])
+
+    def test_stale_minute_is_not_counted_but_closes_bucket(self):
+        self.feed(10, 11, 1000, 900, 5500)
+        self.feed(10, 12, 2500, 800, 5510)
+        rows = self.feed(10, 14, 5000, 5000, 9999, stale=True)
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row[3:9], ["+1,500", "-100", "5500", "5510", "5500", "5510"])
+        self.assertEqual(row[-1], 2)
+
+    def test_stale_minute_alone_opens_no_bucket(self):
+        self.assertEqual(self.feed(10, 12, 1000, 900, stale=True), [])
+        self.assertIsNone(self.rollup.bucket)
+
+    def test_final_closes_open_bucket(self):
+        self.feed(23, 25, 1000, 900)
+        rows = self.feed(23, 26, 1010, 910, final=True)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][-1], 2)
+        self.assertIsNone(self.rollup.bucket)
+
+    def test_zero_price_and_pcr_are_ignored(self):
+        rows = self.rollup.update(minute(10, 14), data(1000, 900, 0, coi_pcr="0.00"), "Neutral Trend")
+        self.assertEqual(rows[0][2], "-")
+        self.assertEqual(rows[0][5:9], ["0", "0", "0", "0"])
+
+
+class RollupSetTest(unittest.TestCase):
+    def test_closed_rows_by_timeframe(self):
+        rollup_set = rollups.RollupSet()
+        closed = {}
+        for mm in range(0, 15):
+            for label, rows in rollup_set.update(minute(10, mm), data(1000, 900), "Neutral Trend").items():
+                closed.setdefault(label, []).extend(rows)
+        self.assertEqual(len(closed['5m']), 3)
+        self.assertEqual(len(closed['15m']), 1)
+        self.assertNotIn('1h', closed)
+
+    def test_skip_partial_drops_buckets_started_before_restore(self):
+        rollup_set = rollups.RollupSet([(5, '5m'), (15, '15m')])
+        rollup_set.skip_partial(minute(10, 7))
+        closed = {}
+        for mm in range(7, 15):
+            for label, rows in rollup_set.update(minute(10, mm), data(1000, 900), "Neutral Trend").items():
+                closed.setdefault(label, []).extend(rows)
+        self.assertEqual([row[0] for row in closed['5m']], ["2026-01-05 10:10 IST"])
+        self.assertNotIn('15m', closed)
+
+    def test_reset_clears_partial_marker(self):
+        rollup_set = rollups.RollupSet([(5, '5m')])
+        rollup_set.skip_partial(minute(10, 7))
+        rollup_set.reset()
+        rows = rollup_set.update(minute(10, 9), data(1000, 900), "Neutral Trend")
+        self.assertEqual(rows['5m'][0][0], "2026-01-05 10:05 IST")
+
+
+if __name__ == '__main__':
+    unittest.main()
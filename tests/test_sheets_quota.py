@@ -0,0 +1,108 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import sheets_quota
+
+
+class RateLimited(Exception):
+    def __init__(self):
+        super().__init__("429 Too Many Requests")
+        self.response = mock.Mock(status_code=429)
+
+
+class QuotaGovernorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def governor(self, per_minute):
+        return sheets_quota.QuotaGovernor(per_minute, os.path.join(self.tmp.name, 'bucket.json'))
+
+    def test_queued_requests_are_granted_by_priority(self):
+        governor = self.governor(per_minute=120)
+        governor.drain()
+        order = []
+
+        def request(priority):
+            governor.acquire(priority)
+            order.append(priority)
+
+        # Without reserves every grant is decided by queue order alone
+        with mock.patch.dict(sheets_quota.RESERVE, {p: 0.0 for p in sheets_quota.RESERVE}):
+            threads = []
+            for priority in (sheets_quota.RESET, sheets_quota.MANUAL, sheets_quota.LIVE):
+                thread = threading.Thread(target=request, args=(priority,))
+                thread.start()
+                threads.append(thread)
+                time.sleep(0.05)
+            for thread in threads:
+                thread.join(timeout=10)
+
+        self.assertEqual(order, [sheets_quota.LIVE, sheets_quota.MANUAL, sheets_quota.RESET])
+        self.assertEqual(governor.usage()['granted'], {'live': 1, 'manual': 1, 'reset': 1})
+
+    def test_lower_priorities_leave_a_reserve(self):
+        governor = self.governor(per_minute=10)
+        for _ in range(8):
+            self.assertEqual(governor._try_take(sheets_quota.MANUAL, 1), 0)
+        self.assertGreater(governor._try_take(sheets_quota.MANUAL, 1), 0)
+        self.assertGreater(governor._try_take(sheets_quota.RESET, 1), 0)
+        self.assertEqual(governor._try_take(sheets_quota.LIVE, 1), 0)
+
+    def test_queued_seconds_tracks_waiting_thread(self):
+        governor = self.governor(per_minute=120)
+        governor.drain()
+        thread_ids = []
+
+        def request():
+            thread_ids.append(threading.get_ident())
+            governor.acquire(sheets_quota.LIVE)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        time.sleep(0.2)
+        self.assertGreater(governor.queued_seconds(thread_ids[0]), 0.1)
+        thread.join(timeout=5)
+        self.assertGreaterEqual(governor.queued_seconds(thread_ids[0]), 0.4)
+        self.assertEqual(governor.queued_seconds(threading.get_ident()), 0.0)
+
+
+class CallTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.governor = sheets_quota.QuotaGovernor(600, os.path.join(tmp.name, 'bucket.json'))
+        patcher = mock.patch.object(sheets_quota, 'governor', self.governor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_429_drains_bucket_and_retries(self):
+        fn = mock.Mock(side_effect=[RateLimited(), 'ok'])
+        self.assertEqual(sheets_quota.call(sheets_quota.LIVE, 1, fn, 'arg'), 'ok')
+        self.assertEqual(fn.call_count, 2)
+        fn.assert_called_with('arg')
+        self.assertEqual(self.governor.throttled, 1)
+        self.assertLess(self.governor.usage()['tokens_available'], 5)
+
+    def test_other_errors_are_not_retried(self):
+        fn = mock.Mock(side_effect=ValueError("bad range"))
+        with self.assertRaises(ValueError):
+            sheets_quota.call(sheets_quota.LIVE, 1, fn)
+        self.assertEqual(fn.call_count, 1)
+        self.assertEqual(self.governor.throttled, 0)
+
+    def test_gives_up_after_max_retries(self):
+        fn = mock.Mock(side_effect=RateLimited())
+        with mock.patch.object(sheets_quota, 'MAX_429_RETRIES', 1):
+            with self.assertRaises(RateLimited):
+                sheets_quota.call(sheets_quota.LIVE, 1, fn)
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(self.governor.throttled, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import sinks
+
+
+class StallingHandler(BaseHTTPRequestHandler):
+    """Webhook stub that holds every request for `stall` seconds before answering"""
+
+    stall = 0.0
+    status = 200
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.stall)
+        self.send_response(self.status)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def snapshot():
+    values = [f"value {i}" for i in range(len(sinks.COLUMNS))]
+    return {'symbol': 'CRUDEOILM', 'values': values, 'stale': False}
+
+
+class SinkDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.jsonl_path = os.path.join(self.tmp.name, 'pcr.jsonl')
+        self.csv_path = os.path.join(self.tmp.name, 'pcr.csv')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def start_stub(self, stall, status=200):
+        handler = type('Handler', (StallingHandler,), {'stall': stall, 'status': status})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}/pcr"
+
+    def dispatcher(self, webhook_url, webhook_timeout):
+        webhook = sinks.WebhookSink(webhook_url)
+        webhook.timeout = webhook_timeout
+        return sinks.SinkDispatcher([
+            sinks.JsonlSink(self.jsonl_path),
+            sinks.CsvSink(self.csv_path),
+            webhook,
+        ])
+
+    def test_stalled_webhook_times_out_without_holding_up_file_sinks(self):
+        url = self.start_stub(stall=2.0)
+        dispatcher = self.dispatcher(url, webhook_timeout=0.5)
+
+        started = time.monotonic()
+        futures = dispatcher.dispatch(snapshot())
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        self.assertEqual(futures['jsonl'].result(timeout=1), self.jsonl_path)
+        self.assertEqual(futures['csv'].result(timeout=1), self.csv_path)
+        self.assertFalse(futures['webhook'].done())
+        with open(self.jsonl_path, encoding='utf-8') as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record['Timestamp'], 'value 0')
+        with open(self.csv_path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        self.assertIsInstance(futures['webhook'].exception(timeout=2), sinks.SinkTimeout)
+        stats = dispatcher.stats_dict()
+        self.assertEqual(stats['jsonl']['sent'], 1)
+        self.assertEqual(stats['csv']['sent'], 1)
+        self.assertEqual(stats['webhook']['sent'], 0)
+        self.assertEqual(stats['webhook']['errors'], 1)
+        self.assertEqual(stats['webhook']['timeouts'], 1)
+        self.assertEqual(stats['webhook']['pending'], 0)
+        self.assertGreaterEqual(stats['webhook']['last_latency_ms'], 500)
+        self.assertIn('SinkTimeout', stats['webhook']['last_error'])
+
+    def test_slow_webhook_records_latency(self):
+        url = self.start_stub(stall=0.3)
+        dispatcher = self.dispatcher(url, webhook_timeout=2)
+
+        futures = dispatcher.dispatch(snapshot())
+        self.assertEqual(futures['webhook'].result(timeout=3), 200)
+
+        stats = dispatcher.stats_dict()['webhook']
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(stats['timeouts'], 0)
+        self.assertGreaterEqual(stats['last_latency_ms'], 300)
+        self.assertEqual(dispatcher.stats_dict()['jsonl']['sent'], 1)
+
+    def test_webhook_error_status_counts_as_error(self):
+        url = self.start_stub(stall=0, status=500)
+        dispatcher = self.dispatcher(url, webhook_timeout=2)
+
+        futures = dispatcher.dispatch(snapshot())
+        self.assertIsNotNone(futures['webhook'].exception(timeout=3))
+
+        stats = dispatcher.stats_dict()['webhook']
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['timeouts'], 0)
+        self.assertIn('500', stats['last_error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
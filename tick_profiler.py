@@ -0,0 +1,197 @@
+import os
+import time
+import threading
+
+import scheduler_lock
+
+# Off unless PCR_PROFILING=1 (enables /debug/profile) or PCR_PROFILE_TICKS=N (capture at startup).
+# While nothing is armed, profile_tick() is a single attribute check around the tick.
+ENABLED = os.environ.get('PCR_PROFILING') == '1' or bool(os.environ.get('PCR_PROFILE_TICKS'))
+DEFAULT_TOP = 20
+MAX_TICKS = 30
+
+REPORT_FILE = os.path.join(scheduler_lock.STATE_DIR, 'pcr_profile_report.txt')
+
+# Requested capture waiting for the next tick, and the capture in progress
+_armed = None
+active_capture = None
+last_report = None
+
+
+class Capture:
+    """cProfile + tracemalloc over N ticks, including the sink writes those ticks trigger"""
+
+    def __init__(self, ticks, top):
+        self.ticks = ticks
+        self.top = top
+        self.ticks_done = 0
+        self.pending_writes = 0
+        self.tick_seconds = []
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.finished = False
+        # tracemalloc snapshot from the start, so the report shows what the ticks allocated
+        self.baseline = None
+
+    def profile(self, fn, *args, **kwargs):
+        """Run fn under its own cProfile (profilers are per thread) and keep the stats
+
+        The call never depends on the profiler: Python 3.12+ allows only one active
+        profiler per process, so if enable() fails fn simply runs unprofiled.
+        """
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except Exception as e:
+            print(f"⚠️ Profiler unavailable on this thread ({e}), running unprofiled")
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self.lock:
+                self.profiles.append(profiler)
+
+    def begin_write(self):
+        with self.lock:
+            self.pending_writes += 1
+
+    def end_write(self):
+        with self.lock:
+            self.pending_writes -= 1
+        self._maybe_finish()
+
+    def end_tick(self, seconds):
+        with self.lock:
+            self.ticks_done += 1
+            self.tick_seconds.append(seconds)
+        self._maybe_finish()
+
+    def _maybe_finish(self):
+        with self.lock:
+            if self.finished or self.ticks_done < self.ticks or self.pending_writes > 0:
+                return
+            self.finished = True
+        _finish(self)
+
+
+def arm(ticks, top=DEFAULT_TOP):
+    """Profile the next `ticks` pipeline runs"""
+    global _armed
+    ticks = max(1, min(int(ticks), MAX_TICKS))
+    top = max(1, int(top))
+    _armed = (ticks, top)
+    print(f"🔬 Profiling armed for the next {ticks} tick(s), top {top}")
+    return ticks, top
+
+
+def profile_tick(fn, *args, **kwargs):
+    """Run one tick, under the profiler if a capture is armed or in progress"""
+    global _armed, active_capture
+
+    if _armed is None and active_capture is None:
+        return fn(*args, **kwargs)
+
+    if active_capture is None:
+        # Everything the report needs is imported before tracing starts, so the
+        # profiler's own imports don't show up as allocation sites
+        import io
+        import pstats
+        import cProfile
+        import tracemalloc
+
+        ticks, top = _armed
+        _armed = None
+        active_capture = Capture(ticks, top)
+        tracemalloc.start(10)
+        active_capture.baseline = tracemalloc.take_snapshot()
+
+    capture = active_capture
+    started = time.perf_counter()
+    try:
+        return capture.profile(fn, *args, **kwargs)
+    finally:
+        if capture.ticks_done + 1 >= capture.ticks:
+            # Stop handing the capture to new ticks; pending sink writes still report in
+            active_capture = None
+        capture.end_tick(time.perf_counter() - started)
+
+
+def _finish(capture):
+    import io
+    import pstats
+    import tracemalloc
+
+    global last_report
+
+    snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+    tracemalloc.stop()
+
+    out = io.StringIO()
+    out.write(f"🔬 Profile of {capture.ticks} tick(s) at {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    out.write("Tick wall time: " + ", ".join(f"{s:.2f}s" for s in capture.tick_seconds) + "\n\n")
+
+    if capture.profiles:
+        stats = pstats.Stats(capture.profiles[0], stream=out)
+        for profiler in capture.profiles[1:]:
+            stats.add(profiler)
+        out.write(f"=== Top {capture.top} functions by cumulative time (tick + sink threads) ===\n")
+        stats.sort_stats('cumulative').print_stats(capture.top)
+    else:
+        out.write("No cProfile data (another profiler was active)\n\n")
+
+    if snapshot is not None and capture.baseline is not None:
+        ignore = [
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        snapshot = snapshot.filter_traces(ignore)
+        baseline = capture.baseline.filter_traces(ignore)
+        out.write(f"=== Top {capture.top} allocation sites (growth since the capture started) ===\n")
+        for stat in snapshot.compare_to(baseline, 'lineno')[:capture.top]:
+            out.write(f"{stat}\n")
+
+    last_report = out.getvalue()
+    print(last_report)
+    try:
+        with open(REPORT_FILE, 'w', encoding='utf-8') as f:
+            f.write(last_report)
+    except OSError as e:
+        print(f"⚠️ Could not save profile report: {e}")
+
+
+def request_capture(ticks, top=DEFAULT_TOP):
+    """Ask the scheduler leader (whichever worker it is) to profile its next ticks"""
+    ticks = max(1, min(int(ticks), MAX_TICKS))
+    top = max(1, int(top))
+    scheduler_lock.update_shared_state(profile_request={'ticks': ticks, 'top': top})
+    return ticks, top
+
+
+def poll_request():
+    """Leader side: arm a capture requested through the shared state"""
+    if not ENABLED:
+        return
+    request = scheduler_lock.read_shared_state().get('profile_request')
+    if request:
+        scheduler_lock.update_shared_state(profile_request=None)
+        arm(request['ticks'], request['top'])
+
+
+def read_report():
+    """Latest report from this process, or the one saved by the scheduler leader"""
+    if last_report is not None:
+        return last_report
+    try:
+        with open(REPORT_FILE, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+if os.environ.get('PCR_PROFILE_TICKS'):
+    arm(os.environ['PCR_PROFILE_TICKS'], os.environ.get('PCR_PROFILE_TOP', DEFAULT_TOP))
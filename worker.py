@@ -0,0 +1,96 @@
+"""Headless PCR worker - runs the scrape/write pipeline without Flask.
+
+    python -m worker --once                      # one row per symbol, then exit (cron / serverless)
+    python -m worker --interval 60               # loop during market hours
+    python -m worker --once --symbols CRUDEOILM,CRUDEOIL
+
+Outputs come from PCR_SINKS (see sinks.py), e.g. PCR_SINKS=sheets,jsonl:pcr.jsonl
+PCR_PROFILE_TICKS=N prints a cProfile/tracemalloc report for the first N ticks.
+"""
+import time
+
+# Taken before anything else is imported so cold start includes interpreter-level imports
+PROCESS_START = time.perf_counter()
+
+import argparse
+import sys
+
+import pcr_pipeline
+import tick_profiler
+
+
+def run_tick(symbols, wait_for_sinks=False):
+    """Write one row per symbol; returns how many succeeded
+
+    Loop mode leaves sink writes running in the background so a slow sink never
+    delays the next tick; --once waits for them before the process exits.
+    """
+    current_time = pcr_pipeline.now_ist()
+    written = 0
+
+    for symbol in symbols:
+        try:
+            print(f"🔄 Worker updating {symbol} at {current_time.strftime('%H:%M:%S')} IST...")
+            result = tick_profiler.profile_tick(pcr_pipeline.run_update, current_time, symbol=symbol)
+            if wait_for_sinks:
+                pcr_pipeline.get_dispatcher().wait(result['futures'], timeout=60)
+                failed = [name for name, future in result['futures'].items()
+                          if not future.done() or future.exception()]
+                if failed:
+                    print(f"❌ {symbol} sink errors: {', '.join(failed)}")
+                    continue
+            written += 1
+            print(f"✅ {symbol} sent to {', '.join(result['futures'])}")
+        except Exception as e:
+            print(f"❌ Worker error for {symbol}: {e}")
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m worker", description="Headless PCR updater")
+    parser.add_argument('--once', action='store_true',
+                        help="run a single tick and exit (ignores market hours)")
+    parser.add_argument('--interval', type=int, default=60,
+                        help="seconds between ticks in loop mode (default: 60)")
+    parser.add_argument('--symbols', default=pcr_pipeline.DEFAULT_SYMBOL,
+                        help="comma-separated niftyinvest symbols: "
+                             f"{', '.join(pcr_pipeline.SUPPORTED_SYMBOLS)} (default: CRUDEOILM)")
+    args = parser.parse_args(argv)
+
+    symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()]
+    for symbol in symbols:
+        try:
+            pcr_pipeline.check_symbol(symbol)
+        except ValueError as e:
+            parser.error(str(e))
+    first_row_logged = False
+    session_date = None
+
+    while True:
+        tick_start = time.perf_counter()
+        now = pcr_pipeline.now_ist()
+
+        # New trading day: yesterday's last row is not today's previous value
+        if session_date is not None and now.date() != session_date:
+            print(f"🗓️ New session {now.date()}, resetting session state")
+            pcr_pipeline.reset_session()
+        session_date = now.date()
+
+        if args.once or pcr_pipeline.is_market_hours(now):
+            written = run_tick(symbols, wait_for_sinks=args.once)
+            if written and not first_row_logged:
+                print(f"⏱️ Cold start to first row: {time.perf_counter() - PROCESS_START:.2f}s")
+                first_row_logged = True
+            if args.once:
+                return 0 if written == len(symbols) else 1
+        else:
+            print("⏸️ Outside market hours, worker idle")
+
+        sleep_time = args.interval - (time.perf_counter() - tick_start)
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+
+if __name__ == '__main__':
+    sys.exit(main())